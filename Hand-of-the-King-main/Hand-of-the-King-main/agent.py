@@ -1,7 +1,16 @@
 from math import inf
-import copy
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context
 import random
-from main import load_board, make_move, get_possible_moves, print_cards_status, save_board, set_banners
+import threading
+import time
+from main import TIMEOUT
+from state import (GameState, HOUSES, HOUSE_MEMBER_COUNT, STAT_COUNT, STAT_PAIRS, STAT_ROW_SUM, STAT_ROW_SQUARES,
+                   STAT_COL_SUM, STAT_COL_SQUARES, ZOBRIST_TURN, ZOBRIST_CHOOSE_COMPANION)
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrdering
+from stats import SearchStats
 
 houses = ["Stark", "Greyjoy", "Lannister",
           "Targaryen", "Baratheon", "Tyrell", "Tully"]
@@ -16,6 +25,34 @@ house_member_count = {
     "Tully": 2,
 }
 
+# Maximum number of entries in the transposition table
+TT_SIZE = 1 << 20
+
+# Seconds the search may use for one move, the rest of TIMEOUT is left for the game loop
+MOVE_TIME = TIMEOUT * 0.8
+
+# Number of processes that split the root moves, 1 searches in the calling process
+SEARCH_WORKERS = 1
+
+# Seed of the order the root moves are split and tie-broken in
+SEARCH_SEED = 0
+
+# Fixed search depth without time limit, for reproducible runs. None deepens until MOVE_TIME
+SEARCH_DEPTH = None
+
+# Positions with at most this many cards on the board, Varys included, are solved to the end of the game
+ENDGAME_CARDS = 8
+
+# Score of a proven win for player 1, larger than any heuristic score
+WIN_SCORE = 10000.0
+
+# Maximum number of solved positions kept between moves
+ENDGAME_TABLE_SIZE = 1 << 20
+
+# Keep searching the position after our move while the opponent thinks, the next
+# search finds the results in the transposition table. Only for SEARCH_WORKERS = 1
+PONDER = False
+
 weights = {
     "capture_banner_bonus": 20.0,  # High priority for securing banners
     "row_col_priority": 3.0,       # Moderate priority for row/column moves
@@ -104,6 +141,34 @@ def house_variance(cards):
     return total_variance
 
 
+def house_heuristic(house, count, pairs, row_sum, row_squares, col_sum, col_squares, banner, opponent_banner):
+    # Heuristic of the cards of one house on the board, from the line statistics of
+    # the house. Added up per house, so it differs from heuristic in the last bits
+    member_count = HOUSE_MEMBER_COUNT[house]
+    score = 0.0
+
+    # Check if capturing these cards would secure a banner
+    if banner + 1 >= opponent_banner:
+        if banner + 1 >= (member_count // 2 + 1):
+            score -= (banner - member_count // 2) * 30.0 * count
+        else:
+            score += weights["capture_banner_bonus"] * count
+
+    # Row and column priority, once for every card of the house next to another one
+    score += weights["row_col_priority"] * pairs
+
+    # General banner count
+    score += banner * house_weight_change(
+        banner, opponent_banner, HOUSES[house]) * count
+
+    # House variance of the rows plus the columns, from the sums of the locations
+    variance = (count * row_squares - row_sum * row_sum +
+                count * col_squares - col_sum * col_sum) / (count * count)
+    score -= variance * weights["house_variance_weight"] * count
+
+    return score
+
+
 def heuristic(player, opponent, cards, varys_location):
     banners = player.get_banners()
     opponent_banners = opponent.get_banners()
@@ -193,280 +258,564 @@ def getScore(cards, player1, player2, turn):
             return -50.0 * who_has_more(player2, player1) + -15.0 * bannerDifferenceScore(player2, player1) - heuristic(player2, player1, cards, varys_location)
 
 
-def minimax(player1, player2, cards, depth, alpha, beta, player, transposition_table=None):
-    if transposition_table is None:
-        transposition_table = {}
+def state_heuristic(state, player, opponent):
+    # heuristic for a GameState, from the line statistics kept by make_move and undo_move
+    banners = state.banners[player]
+    opponent_banners = state.banners[opponent]
+    score = 0
+
+    for house, stats in enumerate(state.line_stats):
+        if stats[STAT_COUNT]:
+            score += house_heuristic(house, stats[STAT_COUNT], stats[STAT_PAIRS],
+                                     stats[STAT_ROW_SUM], stats[STAT_ROW_SQUARES],
+                                     stats[STAT_COL_SUM], stats[STAT_COL_SQUARES],
+                                     banners[house], opponent_banners[house])
+
+    return score
+
+
+def state_who_has_more(state, player, opponent):
+    banners = state.banners[player]
+    opponent_banners = state.banners[opponent]
+    results = 0
+    for house in range(len(HOUSES)):
+        if banners[house] > HOUSE_MEMBER_COUNT[house] // 2:
+            results += -2
+        elif banners[house] > opponent_banners[house]:
+            results += 1
+    return results
 
-    # Generate state hash
-    cards_state = tuple(sorted(
-        (card.get_house(), card.get_name(), card.get_location()) for card in cards))
 
-    # Corrected: Iterate over houses and their card lists for player1
-    p1_cards = tuple(sorted(
-        (card.get_house(), card.get_name(), card.get_location())
-        for house in player1.get_cards()  # Iterate over houses
-        # Then iterate over cards in each house
-        for card in player1.get_cards()[house]
-    ))
+def evaluate(state, turn):
+    # getScore for a GameState, turn is 1 for player 1 and -1 for player 2
+    banner_difference = sum(state.banners[0]) - sum(state.banners[1])
+
+    if turn == 1:
+        return 50.0 * state_who_has_more(state, 0, 1) + 15.0 * banner_difference + state_heuristic(state, 0, 1)
+    else:
+        return -50.0 * state_who_has_more(state, 1, 0) + -15.0 * -banner_difference - state_heuristic(state, 1, 0)
 
-    # Similarly for player2
-    p2_cards = tuple(sorted(
-        (card.get_house(), card.get_name(), card.get_location())
-        for house in player2.get_cards()
-        for card in player2.get_cards()[house]
-    ))
 
-    p1_banners = tuple(sorted(player1.get_banners().items()))
-    p2_banners = tuple(sorted(player2.get_banners().items()))
+def publish(move):
+    # Report the best move found so far, the game plays it if the search runs out of time.
+    # Moves found while pondering belong to the opponent's position
+    if publish_move is not None and move is not None and not pondering:
+        publish_move(move)
 
-    state_hash = (cards_state, (p1_banners, p1_cards), (p2_banners, p2_cards))
-    key = (state_hash, player)
 
-    if key in transposition_table:
-        return transposition_table[key]
+class SearchTimeout(Exception):
+    # Raised inside minimax when the deadline of the move has passed
+    pass
+
+
+def position_key(state, player, choose_companion):
+    # Zobrist hash of the position, the player to move and the phase of the turn
+    key = state.hash ^ ZOBRIST_TURN if player == 1 else state.hash
+    if choose_companion:
+        key ^= ZOBRIST_CHOOSE_COMPANION
+    return key
+
+
+def play_search_move(state, move, player, choose_companion):
+    # Apply a move of the search in place, returns the player to move next
+    # and whether that player has to choose a companion card
+    turn = 1 if player == 1 else 2
+
+    if choose_companion:
+        state.make_companion_move(move, turn)
+
+        # Melisandre gives the same player another turn
+        if move[0] == 'Melisandre':
+            return player, False
+        return -player, False
+
+    house = state.make_move(move, turn)
+
+    # Taking the last card of a house lets the same player choose a companion
+    if not state.boards[house] and state.companions:
+        return player, True
+    return -player, False
+
+
+def minimax(state, depth, alpha, beta, player, transposition_table=None, deadline=None,
+            ordering=None, ply=0, choose_companion=False):
+    if transposition_table is None:
+        transposition_table = TranspositionTable(TT_SIZE)
+    if ordering is None:
+        ordering = MoveOrdering()
+
+    # Give up on the iteration, the caller keeps the last completed one
+    if deadline is not None and (time.time() >= deadline or ponder_stop.is_set()):
+        raise SearchTimeout
+
+    search_stats.nodes += 1
+    if ply > search_stats.max_ply:
+        search_stats.max_ply = ply
+
+    card_count = state.get_card_count()
+
+    # Few cards left: the rest of the game is solved instead of evaluated
+    if ply > 0 and card_count <= ENDGAME_CARDS:
+        move, result = solve(state, player, -1, 1, deadline, choose_companion)
+        return (move, result * WIN_SCORE)
+
+    key = position_key(state, player, choose_companion)
+    original_alpha, original_beta = alpha, beta
+
+    # Only use entries searched at least as deep, bounds narrow the window
+    entry = transposition_table.probe(key)
+    tt_move = entry[4] if entry is not None else None
+    if entry is not None and entry[1] >= depth:
+        _, _, flag, score, move, _ = entry
+        if flag == EXACT:
+            return (move, score)
+        elif flag == LOWER:
+            alpha = max(alpha, score)
+        else:
+            beta = min(beta, score)
+        if alpha >= beta:
+            return (move, score)
 
     move = None
+    turn = 1 if player == 1 else 2
+
+    if choose_companion:
+        # Companion moves are generated one at a time, a cutoff skips the rest
+        possible_moves = state.generate_companion_moves()
+        first_move = next(possible_moves, None)
+        has_moves = first_move is not None
+        possible_moves = ordering.order_companion_moves(
+            chain([first_move] if has_moves else [], possible_moves), tt_move)
+    else:
+        possible_moves = state.get_possible_moves()
+        has_moves = bool(possible_moves)
 
     # Terminal condition: return heuristic score
-    if depth == 0 or len(cards) == 0:
-        score = getScore(cards, player1, player2, player)
-        transposition_table[key] = (move, score)
+    if depth == 0 or not has_moves:
+        score = evaluate(state, player)
+        transposition_table.store(key, depth, EXACT, score, move)
         return (move, score)
 
-    # Evaluate moves recursively
-    for possible_move in get_possible_moves(cards):
-        # Deep copy the game state to simulate the move
-        copied_cards = copy.deepcopy(cards)
-        copied_p1 = copy.deepcopy(player1)
-        copied_p2 = copy.deepcopy(player2)
+    if not choose_companion:
+        possible_moves = ordering.order_moves(
+            state, possible_moves, ply, turn, tt_move)
 
-        # Apply the move
-        if player == 1:
-            make_move(copied_cards, possible_move, copied_p1)
-        else:
-            make_move(copied_cards, possible_move, copied_p2)
+    # Evaluate moves recursively
+    for index, possible_move in enumerate(possible_moves):
+        # Apply the move in place
+        next_player, next_choose_companion = play_search_move(
+            state, possible_move, player, choose_companion)
 
         # Recursive Minimax call
-        _, score = minimax(copied_p1, copied_p2, copied_cards,
-                           depth - 1, alpha, beta, -player, transposition_table)
+        _, score = minimax(state, depth - 1, alpha, beta, next_player,
+                           transposition_table, deadline, ordering, ply + 1, next_choose_companion)
+
+        # Roll the move back
+        state.undo_move()
 
         # Update alpha/beta
         if player == 1:
             if score > alpha:
                 alpha = score
                 move = possible_move
+                if ply == 0:
+                    publish(move)
             if alpha >= beta:
+                ordering.record_cutoff(
+                    state, possible_move, ply, depth, turn, index == 0)
                 break  # Alpha-beta pruning
         else:
             if score < beta:
                 beta = score
                 move = possible_move
+                if ply == 0:
+                    publish(move)
             if beta <= alpha:
+                ordering.record_cutoff(
+                    state, possible_move, ply, depth, turn, index == 0)
                 break  # Alpha-beta pruning
 
-    # Store result in transposition table
-    result = (move, alpha) if player == 1 else (move, beta)
-    transposition_table[key] = result
-    return result
+    # Store result in transposition table with its bound type
+    score = alpha if player == 1 else beta
+    if score <= original_alpha:
+        flag = UPPER
+    elif score >= original_beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table.store(key, depth, flag, score, move)
+    return (move, score)
 
 
-def get_valid_ramsay(cards):
-    '''
-    This function gets the possible moves for Ramsay.
+def game_result(state):
+    # Result of a finished game for player 1 like main.calculate_winner: 1 win, 0 draw, -1 loss
+    winner = state.calculate_winner()
+    if winner is None:
+        return 0
+    return 1 if winner == 1 else -1
 
-    Parameters:
-        cards (list): list of Card objects
 
-    Returns:
-        moves (list): list of possible moves
-    '''
+def solve(state, player, alpha=-1, beta=1, deadline=None, choose_companion=False):
+    # Alpha-beta search to the end of the game, returns (move, result) with the
+    # result for player 1. The bounds of every solved position are kept in
+    # endgame_table, so a position reached again is not solved twice
+    if deadline is not None and (time.time() >= deadline or ponder_stop.is_set()):
+        raise SearchTimeout
 
-    moves = []
+    search_stats.nodes += 1
 
-    for card in cards:
-        moves.append(card.get_location())
+    key = position_key(state, player, choose_companion)
 
-    return moves
+    lower, upper, move = endgame_table.get(key, (-1, 1, None))
+    if lower == upper or lower >= beta:
+        return (move, lower)
+    if upper <= alpha:
+        return (move, upper)
+    alpha, beta = max(alpha, lower), min(beta, upper)
+    original_alpha, original_beta = alpha, beta
 
+    if choose_companion:
+        possible_moves = list(state.generate_companion_moves())
+    else:
+        # Moves that take the most cards first
+        possible_moves = sorted(state.get_possible_moves(), reverse=True,
+                                key=lambda possible_move: state.get_captures(possible_move)[1].bit_count())
+
+    # The game is over, a companion choice without moves ends the search like in minimax
+    if not possible_moves:
+        result = game_result(state)
+        endgame_table[key] = (result, result, None)
+        return (None, result)
+
+    # The best move of an earlier search of the position first
+    if move in possible_moves:
+        possible_moves.remove(move)
+        possible_moves.insert(0, move)
+
+    best_move, best = None, -2 if player == 1 else 2
+
+    for possible_move in possible_moves:
+        next_player, next_choose_companion = play_search_move(
+            state, possible_move, player, choose_companion)
+        _, result = solve(state, next_player, alpha, beta,
+                          deadline, next_choose_companion)
+        state.undo_move()
+
+        if player == 1 and result > best:
+            best, best_move = result, possible_move
+            alpha = max(alpha, result)
+        elif player != 1 and result < best:
+            best, best_move = result, possible_move
+            beta = min(beta, result)
+
+        if alpha >= beta:
+            break
+
+    # A result outside the window is only a bound. The move is replaced if it proves
+    # the bound on the side of the player to move, every move is as good in a lost position
+    if best <= original_alpha:
+        upper = best
+    elif best >= original_beta:
+        lower = best
+    else:
+        lower = upper = best
 
-def get_valid_jon_sandor_jaqan(cards):
-    '''
-    This function gets the possible moves for Jon Snow, Sandor Clegane, and Jaqen H'ghar.
+    if move is None or ((best > original_alpha) if player == 1 else (best < original_beta)):
+        move = best_move
 
-    Parameters:
-        cards (list): list of Card objects
+    endgame_table[key] = (lower, upper, move)
+    return (move, best)
 
-    Returns:
-        moves (list): list of possible moves
-    '''
 
-    moves = []
+def solve_endgame(state, player, deadline, choose_companion=False):
+    # Solve the root position, returns the best move or None if the deadline passed
+    try:
+        move, result = solve(state, player, -1, 1, deadline, choose_companion)
+    except SearchTimeout:
+        return None
 
-    for card in cards:
-        if card.get_name() != 'Varys':
-            moves.append(card.get_location())
+    search_stats.result = result
+    publish(move)
+    return move
 
-    return moves
 
-def get_move(cards, player1, player2, companion_cards=None, choose_companion=True):
-    # Depth limit for minimax
-    limit = 3
+def get_root_moves(state, choose_companion):
+    # Every move of the root position, companion moves are listed in full
+    if choose_companion:
+        return list(state.generate_companion_moves())
+
+    return state.get_possible_moves()
+
+
+def iterative_deepening(state, player, deadline, choose_companion=False):
+    # Search one ply deeper at a time until the deadline, the state is left
+    # in an undefined position if an iteration is cut off
+    possible_moves = get_root_moves(state, choose_companion)
+    if not possible_moves:
+        return None
+
+    best_move = possible_moves[0]
+    publish(best_move)
+
+    for depth in search_depths(state):
+        try:
+            move, _ = minimax(state, depth, -inf, inf, player,
+                              transposition_table, deadline, move_ordering, 0, choose_companion)
+        except SearchTimeout:
+            break
+
+        search_stats.depth = depth
+
+        if move is not None:
+            best_move = move
+            publish(best_move)
+
+    return best_move
+
+
+def search_depths(state):
+    # Every move takes at least one card and every companion card is used once,
+    # deeper searches cannot see more
+    max_depth = state.get_card_count() - 1 + len(state.companions)
+    if SEARCH_DEPTH is not None:
+        max_depth = min(max_depth, SEARCH_DEPTH)
+
+    return range(1, max_depth + 1)
+
+
+def search_root_moves(state, moves, depth, player, deadline, new_move, choose_companion=False):
+    # Search some of the root moves in a worker process with its own tables, returns
+    # the best (move, score, search counters) of them or None if the deadline passed
+    global search_stats
+
+    if new_move:
+        transposition_table.new_search()
+        move_ordering.new_search()
+
+    search_stats = SearchStats(transposition_table, move_ordering)
+
+    alpha, beta = -inf, inf
+    best_move = None
+
+    entry = transposition_table.probe(
+        position_key(state, player, choose_companion))
+    tt_move = entry[4] if entry is not None else None
 
     if choose_companion:
-        if companion_cards:
-            current_banners = player2.get_banners()
-            opponent_banners = player1.get_banners()
-
-            # Calculate row/column control
-            your_rows = [sum(1 for card in cards if (card.get_location() // 6) == r and card.get_house() == house)
-                         for r in range(6) for house in current_banners]
-            your_cols = [sum(1 for card in cards if (card.get_location() % 6) == c and card.get_house() == house)
-                         for c in range(6) for house in current_banners]
-
-            needed_to_secure = 4  # Majority in 6-row/col
-            nearly_secured_rows = sum(
-                1 for count in your_rows if count == needed_to_secure - 1)
-            nearly_secured_cols = sum(
-                1 for count in your_cols if count == needed_to_secure - 1)
-
-            # Initialize weights for ALL possible companions using correct keys
-            companion_weights = {
-                companion: 1.0  # Base weight
-                for companion in companion_cards.keys()
-            }
-
-            if 'Melisandre' in companion_weights: 
-                companion_weights['Melisandre'] += 50 * \
-                    (nearly_secured_rows + nearly_secured_cols)
-
-            for house in current_banners:
-                needed = (house_member_count[house] // 2) + 1
-                if (current_banners.get(house, 0) + 1) >= needed and 'Sandor' in companion_weights:
-                    companion_weights['Sandor'] += 40  
-
-            if "Baratheon" in current_banners and "Baratheon" in opponent_banners:
-                if current_banners["Baratheon"] == 2 and opponent_banners["Baratheon"] == 2:
-                    companion_weights['Gendry'] += 1000  
-            jaqen_weight_boost = 0
-            if 'Gendry' in companion_weights:
-                if current_banners.get("Baratheon", 0) == 2 and opponent_banners.get("Baratheon", 0) == 2:
-                    companion_weights['Gendry'] += 1000
-            target_houses = []
-            for house in current_banners:
-                needed = (house_member_count[house] // 2) + 1
-                if (current_banners.get(house, 0) + 1) >= needed:
-                    target_houses.append(house)
-                    if 'Jon' in companion_weights: 
-                        companion_weights['Jon'] += 50
-            save_board(cards, 'current_strategy_board')
-
-        # Load fresh board state to ensure accuracy
-            current_board, _ = load_board('current_strategy_board')
-            location_house_map = {card.get_location(): card.get_house() for card in current_board}            # Select companion with highest weight
-            selected_companion = max(
-                companion_weights, key=companion_weights.get, default=None)
-
-            move = [selected_companion]
-            choices = companion_cards[selected_companion]['Choice']
-
-            # Handle choices based on companion type
-            if choices == 1:  # Jon-style
-                valid_moves = get_valid_jon_sandor_jaqan(cards)
-                if valid_moves:
-                    current_houses = {card.get_location(): card.get_house() for card in cards}
-                    # Prioritize locations that complete house majorities
-                    priority_moves = [
-                        loc for loc in valid_moves
-                        if current_houses.get(loc) in target_houses
-                    ]
-                    if not priority_moves:
-                        priority_moves = sorted(
-                            valid_moves,
-                            key=lambda loc: (needed_to_secure - your_rows[loc//6], 
-                                           needed_to_secure - your_cols[loc%6])
-                        )
-                    move.append(priority_moves[0] if priority_moves else valid_moves[0])
-
-            elif choices == 2:  # Ramsay-style
-                valid_moves = get_valid_ramsay(cards)
-                if valid_moves:
-                    # Strategic swap logic
-                    current_banners = player2.get_banners()
-                    opponent_banners = player1.get_banners()
-                    
-                    # 1. Find overcrowded rows/columns with 3+ same house cards but no banner control
-                    overcrowded = []
-                    for i in range(6):
-                        # Check rows
-                        row = [card for card in cards if card.get_location() // 6 == i]
-                        houses = {}
-                        for card in row:
-                            if card.get_house() in houses:
-                                houses[card.get_house()] += 1
-                            else:
-                                houses[card.get_house()] = 1
-                        for house, count in houses.items():
-                            if count >= 3 and current_banners.get(house, 0) < (house_member_count[house] // 2) + 1:
-                                overcrowded.extend([card.get_location() for card in row if card.get_house() == house])
-                        
-                        # Check columns
-                        col = [card for card in cards if card.get_location() % 6 == i]
-                        houses = {}
-                        for card in col:
-                            if card.get_house() in houses:
-                                houses[card.get_house()] += 1
-                            else:
-                                houses[card.get_house()] = 1
-                        for house, count in houses.items():
-                            if count >= 3 and current_banners.get(house, 0) < (house_member_count[house] // 2) + 1:
-                                overcrowded.extend([card.get_location() for card in col if card.get_house() == house])
-
-                    # 2. Find contested houses (tie or ±1 banner difference)
-                    contested_houses = [
-                        house for house in houses 
-                        if abs(current_banners.get(house, 0) - opponent_banners.get(house, 0)) <= 1
-                    ]
-                    final_moves = []
-                    # Select top 2 prioritized moves
-                    if len(final_moves) >= 2:
-                        move.extend(final_moves[:2])
-                    elif valid_moves:
-                        # Fallback to first two valid moves (non-random)
-                        move.extend(valid_moves[:2])
-            elif choices == 3:  # Jaqen-style
-                if 'Jaqen' in companion_weights:
-                    enemy_strongholds = [
-                        card.get_location() for card in cards
-                        if (your_rows[card.get_location() // 6] >= needed_to_secure - 1 or
-                            your_cols[card.get_location() % 6] >= needed_to_secure - 1)
-                    ]
-                    jaqen_weight_boost = 30 * len(enemy_strongholds)
-
-                    if len(companion_cards) >= 2:
-                        jaqen_weight_boost += 40
-
-                    companion_weights['Jaqen'] += jaqen_weight_boost
-
-                valid_moves = get_valid_jon_sandor_jaqan(cards)
-                if valid_moves:
-                    prioritized_moves = [
-                        loc for loc in valid_moves
-                        if any(card.get_location() == loc for card in cards 
-                               if card.get_house() in opponent_banners)
-                    ]
-                    
-                    if len(prioritized_moves) >= 2:
-                        move.extend(prioritized_moves[:2])
-                    else:
-                        move.extend(random.sample(
-                            valid_moves, min(2, len(valid_moves)))
-                        )
-            return move
-        else:
-            return []
+        moves = list(move_ordering.order_companion_moves(
+            moves, tt_move if tt_move in moves else None))
+    else:
+        moves = move_ordering.order_moves(
+            state, moves, 0, 1 if player == 1 else 2, tt_move)
+
+    try:
+        for move in moves:
+            next_player, next_choose_companion = play_search_move(
+                state, move, player, choose_companion)
+            _, score = minimax(state, depth - 1, alpha, beta, next_player,
+                               transposition_table, deadline, move_ordering, 1, next_choose_companion)
+            state.undo_move()
+
+            if player == 1 and (best_move is None or score > alpha):
+                alpha = score
+                best_move = move
+            elif player != 1 and (best_move is None or score < beta):
+                beta = score
+                best_move = move
+    except SearchTimeout:
+        return None
+
+    return best_move, alpha if player == 1 else beta, search_stats.get_counts()
+
+
+def parallel_search(state, player, deadline, choose_companion=False):
+    # Iterative deepening where every depth is split over SEARCH_WORKERS processes.
+    # Each worker always gets the same share of the root moves in a seeded order,
+    # so a fixed seed and SEARCH_DEPTH give the same move on every run
+    possible_moves = get_root_moves(state, choose_companion)
+    if not possible_moves:
+        return None
+
+    # Workers are kept between moves, so their transposition tables stay warm
+    while len(search_workers) < SEARCH_WORKERS:
+        search_workers.append(ProcessPoolExecutor(
+            max_workers=1, mp_context=get_context('spawn')))
+
+    order = sorted(possible_moves)
+    random.Random(SEARCH_SEED).shuffle(order)
+    shares = [order[i::SEARCH_WORKERS] for i in range(SEARCH_WORKERS)]
+    best_move = order[0]
+    publish(best_move)
+
+    for depth in search_depths(state):
+        futures = [worker.submit(search_root_moves, state, share, depth, player, deadline, depth == 1, choose_companion)
+                   for worker, share in zip(search_workers, shares) if share]
+
+        timeout = None if deadline is None else max(
+            0.0, deadline - time.time()) + 0.1
+        done, not_done = wait(futures, timeout=timeout)
+        results = [future.result() for future in futures if future in done]
+
+        for result in results:
+            if result is not None:
+                search_stats.add(result[2])
+
+        if not_done or None in results:
+            break
+
+        search_stats.depth = depth
+
+        # Best score over the workers, ties go to the earliest move in the seeded order
+        sign = 1 if player == 1 else -1
+        best_move = max(results, key=lambda result: (
+            sign * result[1], -order.index(result[0])))[0]
+        publish(best_move)
+
+    return best_move
+
+
+# Transposition table kept between the moves of a game
+transposition_table = TranspositionTable(TT_SIZE)
+
+# Killer moves, history table and cutoff counters of the search
+move_ordering = MoveOrdering()
+
+# Processes of the parallel search, started by the first parallel move
+search_workers = []
+
+# Called with the best move found so far, set by the game to play it if get_move runs out of time
+publish_move = None
+
+# Statistics of the search of the current or last move
+search_stats = SearchStats(transposition_table, move_ordering)
+
+# Lower bound, upper bound and best move of every position solved to the end of the game
+endgame_table = {}
+
+
+# Set to stop the search of the ponder thread
+ponder_stop = threading.Event()
+
+# Thread searching the position after our last move, None if it is not pondering
+ponder_thread = None
+
+# Whether the ponder thread is searching, its moves are not published
+pondering = False
+
+# Statistics of the last move, kept apart from the counters of pondering
+move_stats = None
+
+
+def ponder(state, player, choose_companion):
+    # Search the pondered position one ply deeper at a time until
+    # stop_pondering is called, the next move finds it in the transposition table
+    global pondering, search_stats
+
+    search_stats = SearchStats(transposition_table, move_ordering)
+
+    for depth in search_depths(state):
+        try:
+            minimax(state, depth, -inf, inf, player, transposition_table,
+                    inf, move_ordering, 0, choose_companion)
+        except SearchTimeout:
+            break
+
+    pondering = False
+
+
+def start_pondering(state, move, choose_companion):
+    # Start pondering after our move, the state is changed by the thread. If the
+    # table has a best reply of the opponent, the position after it is searched
+    # like our next move would search it. Otherwise every reply is searched
+    global ponder_thread, pondering
+
+    player, next_choose_companion = play_search_move(
+        state, move, -1, choose_companion)
+
+    # The opponent may move more than once, after a house is taken or with Melisandre
+    while player == 1:
+        entry = transposition_table.probe(
+            position_key(state, player, next_choose_companion))
+        reply = entry[4] if entry is not None else None
+        if reply is None or reply not in get_root_moves(state, next_choose_companion):
+            break
+        player, next_choose_companion = play_search_move(
+            state, reply, player, next_choose_companion)
+
+    # Ponder in the generation of our next move, which then does not age its entries out
+    transposition_table.new_search()
+
+    pondering = True
+    ponder_thread = threading.Thread(target=ponder, args=(
+        state, player, next_choose_companion), daemon=True)
+    ponder_thread.start()
+
+
+def stop_pondering():
+    # Stop the ponder thread and wait for it, its table entries are kept.
+    # Returns whether there was a ponder thread
+    global ponder_thread, pondering
+
+    if ponder_thread is None:
+        return False
+
+    ponder_stop.set()
+    ponder_thread.join()
+    ponder_stop.clear()
+
+    ponder_thread = None
+    pondering = False
+    return True
+
+
+def get_move(cards, player1, player2, companion_cards=None, choose_companion=True):
+    global search_stats, move_stats
+
+    # The search of the opponent's time ends when our time starts
+    pondered = stop_pondering()
+
+    deadline = time.time() + MOVE_TIME if SEARCH_DEPTH is None else None
+
+    # Keep the table of the previous moves, their entries are aged out first.
+    # Pondering already started the generation of this move
+    if not pondered:
+        transposition_table.new_search()
+    move_ordering.new_search()
+    search_stats = SearchStats(transposition_table, move_ordering)
+
+    state = GameState.from_cards(cards, player1, player2, companion_cards)
+
+    if len(endgame_table) > ENDGAME_TABLE_SIZE:
+        endgame_table.clear()
+
+    move = None
+
+    # Few cards left: play the proven best move, search as usual if solving ran out of time
+    if state.get_card_count() <= ENDGAME_CARDS:
+        move = solve_endgame(state, -1, deadline, choose_companion)
+
+    # Companion choices are searched like the other moves
+    if move is None and SEARCH_WORKERS > 1:
+        move = parallel_search(state, -1, deadline, choose_companion)
+    elif move is None:
+        move = iterative_deepening(state, -1, deadline, choose_companion)
+
+    search_stats.finish()
+    move_stats = search_stats.to_dict()
+
+    # No companion card can be used
+    if choose_companion and move is None:
+        return []
+
+    # A cut off search leaves the state in another position, so a new one is made
+    if PONDER and SEARCH_WORKERS == 1 and SEARCH_DEPTH is None and move is not None:
+        start_pondering(GameState.from_cards(cards, player1, player2, companion_cards),
+                        move, choose_companion)
+
+    return move
+
+
+def get_stats():
+    # Statistics of the search of the last move, read by the game after get_move
+    return move_stats
 
-    player1_copy = copy.copy(player1)
-    player2_copy = copy.copy(player2)
-    result = minimax(player1_copy, player2_copy, cards,
-                     limit, -inf, inf, -1, transposition_table={})
-    return result[0]
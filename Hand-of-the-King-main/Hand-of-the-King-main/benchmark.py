@@ -0,0 +1,353 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from math import inf
+from os import listdir, makedirs
+from os.path import join
+
+from main import (path, apply_move, get_possible_moves, load_board, make_board, make_move, save_board, set_banners,
+                  undo_move)
+from classes import Player
+from state import GameState, HOUSES
+from transposition import TranspositionTable
+from ordering import MoveOrdering
+from stats import SearchStats
+import agent
+import without_transposition
+
+CORPUS = 'benchmark' # Folder of the benchmark boards in boards/
+CORPUS_SEED = 2025 # Seed the corpus was made with
+CORPUS_STAGES = [36, 24, 14] # Number of cards on the boards of every stage of the game
+
+parser = argparse.ArgumentParser(description="A Game of Thrones: Hand of the King benchmarks")
+parser.add_argument('-o', '--output', type=str, help="JSON file to save the results to", default=None)
+parser.add_argument('-c', '--compare', type=str, help="JSON file of saved results to compare against", default=None)
+parser.add_argument('-t', '--threshold', type=float, help="slowdown that counts as a regression, 0.1 is 10%%", default=0.1)
+parser.add_argument('-d', '--depth', type=int, help="deepest search of the agent benchmarks", default=4)
+parser.add_argument('--min-time', type=float, help="seconds every operation benchmark runs for", default=0.5)
+parser.add_argument('--make-corpus', action='store_true', help="write the benchmark boards again and exit")
+
+def make_corpus(boards=4, seed=CORPUS_SEED):
+    '''
+    This function writes the benchmark boards, every board at every stage of the game.
+    The later stages are reached with random moves from the first one.
+
+    Parameters:
+        boards (int): number of boards of every stage
+        seed (int): seed of the boards and the moves
+    '''
+
+    makedirs(join(path, "boards", CORPUS), exist_ok=True)
+    random.seed(seed)
+
+    for i in range(boards):
+        cards, _ = make_board()
+        player = Player('benchmark')
+
+        for card_count in CORPUS_STAGES:
+            while len(cards) > card_count and get_possible_moves(cards):
+                make_move(cards, random.choice(get_possible_moves(cards)), player)
+
+            save_board(cards, join(CORPUS, f'board_{i}_{card_count}'))
+
+def load_corpus():
+    '''
+    This function loads the benchmark boards.
+
+    Returns:
+        boards (list): list of (name, cards) of every board, in name order
+    '''
+
+    names = sorted(name[:-len('.json')] for name in listdir(join(path, "boards", CORPUS)) if name.endswith('.json'))
+
+    return [(name, load_board(join(CORPUS, name))[0]) for name in names]
+
+def measure(operation, min_time):
+    '''
+    This function runs an operation again and again for at least min_time seconds, three times.
+
+    Parameters:
+        operation (function): runs a number of operations and returns that number
+        min_time (float): seconds every run takes at least
+
+    Returns:
+        ops_per_second (float): operations per second of the fastest run
+    '''
+
+    best = 0.0
+
+    for _ in range(3):
+        count = 0
+        start = time.perf_counter()
+
+        while True:
+            count += operation()
+            elapsed = time.perf_counter() - start
+
+            if elapsed >= min_time:
+                break
+
+        best = max(best, count / elapsed)
+
+    return best
+
+def benchmark_operations(corpus, min_time):
+    '''
+    This function measures the rules engine and the evaluation on the list of cards and on GameState.
+
+    Parameters:
+        corpus (list): list of (name, cards) of the benchmark boards
+        min_time (float): seconds every benchmark runs for
+
+    Returns:
+        metrics (dict): operations per second of every benchmark
+    '''
+
+    boards = [cards for _, cards in corpus]
+    players = [(Player('player1'), Player('player2')) for _ in boards]
+    states = [GameState.from_cards(cards) for cards in boards]
+    moves = [get_possible_moves(cards) for cards in boards]
+
+    # The banner benchmarks change the banners, so they get players and states of their own,
+    # and the evaluation is measured on the boards as they were saved
+    banner_players = [(Player('player1'), Player('player2')) for _ in boards]
+    banner_states = [GameState.from_cards(cards) for cards in boards]
+
+    def list_move_generation():
+        for cards in boards:
+            get_possible_moves(cards)
+
+        return len(boards)
+
+    def state_move_generation():
+        for state in states:
+            state.get_possible_moves()
+
+        return len(states)
+
+    def list_make_undo():
+        count = 0
+
+        for cards, (player1, player2), board_moves in zip(boards, players, moves):
+            history = []
+
+            for move in board_moves:
+                apply_move(cards, move, player1, player2, 1, history)
+                undo_move(cards, None, player1, player2, history)
+
+            count += len(board_moves)
+
+        return count
+
+    def state_make_undo():
+        count = 0
+
+        for state, board_moves in zip(states, moves):
+            for move in board_moves:
+                state.make_move(move, 1)
+                state.undo_move()
+
+            count += len(board_moves)
+
+        return count
+
+    def list_banners():
+        for player1, player2 in banner_players:
+            for house in HOUSES:
+                set_banners(player1, player2, house, 1)
+
+        return len(banner_players) * len(HOUSES)
+
+    def state_banners():
+        for state in banner_states:
+            for house in range(len(HOUSES)):
+                state.set_house_banner(house, 1)
+
+        return len(banner_states) * len(HOUSES)
+
+    def list_evaluation():
+        for cards, (player1, player2) in zip(boards, players):
+            agent.getScore(cards, player1, player2, -1)
+
+        return len(boards)
+
+    def state_evaluation():
+        for state in states:
+            agent.evaluate(state, -1)
+
+        return len(states)
+
+    benchmarks = {
+        'move_generation.list': list_move_generation,
+        'move_generation.state': state_move_generation,
+        'make_undo.list': list_make_undo,
+        'make_undo.state': state_make_undo,
+        'banners.list': list_banners,
+        'banners.state': state_banners,
+        'evaluation.list': list_evaluation,
+        'evaluation.state': state_evaluation,
+    }
+
+    return {name: {'value': measure(operation, min_time), 'unit': 'ops/s'} for name, operation in benchmarks.items()}
+
+def benchmark_agent_search(corpus, max_depth):
+    '''
+    This function measures the search of agent.py with a fresh transposition table and endgame table
+    on every board, deepening one ply at a time like a move does.
+
+    Parameters:
+        corpus (list): list of (name, cards) of the benchmark boards
+        max_depth (int): deepest search
+
+    Returns:
+        metrics (dict): nodes per second, share of the cutoffs caused by the first move and time to every depth,
+                        added up over the boards
+    '''
+
+    nodes = 0
+    cutoffs = 0
+    first_move_cutoffs = 0
+    total_time = 0.0
+    time_to_depth = [0.0] * (max_depth + 1)
+
+    for _, cards in corpus:
+        state = GameState.from_cards(cards)
+        agent.endgame_table.clear() # Solved endgames of the last board would make this one faster
+        transposition_table = TranspositionTable(agent.TT_SIZE)
+        ordering = MoveOrdering()
+        agent.search_stats = SearchStats(transposition_table, ordering)
+
+        for depth in range(1, max_depth + 1):
+            agent.minimax(state, depth, -inf, inf, -1, transposition_table, None, ordering)
+            time_to_depth[depth] += time.perf_counter() - agent.search_stats.start_time
+
+        agent.search_stats.finish()
+        counts = agent.search_stats.get_counts()
+        nodes += counts['nodes']
+        cutoffs += counts['cutoffs']
+        first_move_cutoffs += counts['first_move_cutoffs']
+        total_time += agent.search_stats.end_time - agent.search_stats.start_time
+
+    metrics = {
+        'search.agent.nodes_per_second': {'value': nodes / total_time, 'unit': 'nodes/s'},
+        'search.agent.first_move_cutoff_rate': {'value': first_move_cutoffs / cutoffs if cutoffs else 0.0, 'unit': 'share'},
+    }
+
+    for depth in range(1, max_depth + 1):
+        metrics[f'search.agent.time_to_depth_{depth}'] = {'value': time_to_depth[depth], 'unit': 's'}
+
+    return metrics
+
+def benchmark_list_search(corpus, max_depth):
+    '''
+    This function measures the search of without_transposition.py, which has no node counter.
+
+    Parameters:
+        corpus (list): list of (name, cards) of the benchmark boards
+        max_depth (int): deepest search
+
+    Returns:
+        metrics (dict): time to every depth, added up over the boards
+    '''
+
+    time_to_depth = [0.0] * (max_depth + 1)
+
+    for _, cards in corpus:
+        player1, player2 = Player('player1'), Player('player2')
+        start = time.perf_counter()
+
+        for depth in range(1, max_depth + 1):
+            without_transposition.minimax(player1, player2, cards, depth, -inf, inf, -1)
+            time_to_depth[depth] += time.perf_counter() - start
+
+    return {f'search.without_transposition.time_to_depth_{depth}': {'value': time_to_depth[depth], 'unit': 's'}
+            for depth in range(1, max_depth + 1)}
+
+def compare(results, baseline, threshold):
+    '''
+    This function compares results against a saved baseline.
+    Operations and nodes per second should not go down, times should not go up.
+
+    Parameters:
+        results (dict): results of this run
+        baseline (dict): saved results
+        threshold (float): relative slowdown that counts as a regression
+
+    Returns:
+        regressions (list): names of the metrics that got slower
+    '''
+
+    regressions = []
+
+    for name, metric in results['metrics'].items():
+        if name not in baseline['metrics']:
+            print(f"{name}: {metric['value']:.6g} {metric['unit']} (new)")
+            continue
+
+        old = baseline['metrics'][name]['value']
+        new = metric['value']
+
+        # Relative slowdown, positive if the metric got worse
+        if metric['unit'] == 's':
+            slowdown = (new - old) / old if old else 0.0
+
+        else:
+            slowdown = (old - new) / old if old else 0.0
+
+        regressed = slowdown > threshold
+
+        if regressed:
+            regressions.append(name)
+
+        print(f"{name}: {old:.6g} -> {new:.6g} {metric['unit']} ({-slowdown:+.1%}){' REGRESSION' if regressed else ''}")
+
+    return regressions
+
+def main(args):
+    '''
+    This function runs the benchmarks.
+
+    Parameters:
+        args (Namespace): command line arguments
+    '''
+
+    if args.make_corpus:
+        make_corpus()
+        return
+
+    corpus = load_corpus()
+
+    metrics = benchmark_operations(corpus, args.min_time)
+    metrics.update(benchmark_agent_search(corpus, args.depth))
+    metrics.update(benchmark_list_search(corpus, min(args.depth, 3)))
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'boards': [name for name, _ in corpus],
+        'metrics': metrics,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, args.threshold)
+
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+    else:
+        for name, metric in metrics.items():
+            print(f"{name}: {metric['value']:.6g} {metric['unit']}")
+
+if __name__ == "__main__":
+    main(parser.parse_args())
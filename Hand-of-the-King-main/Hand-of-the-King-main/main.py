@@ -1,6 +1,5 @@
 import argparse
 import importlib
-import concurrent.futures
 import random
 from os import name as os_name
 from os import system as os_system
@@ -8,25 +7,53 @@ from os.path import abspath, join, dirname
 import sys
 import json
 import copy
+import time
 
 # Add the utils folder to the path
 sys.path.append(join(dirname(abspath(__file__)), "utils"))
 
-# Import the utils
-import pygraphics
+# Import the utils, pygraphics is only imported when the game is drawn
 from classes import Card, Player
+from worker import AgentWorker
+from stats import summarize
 
 # Set the path of the file
 path = dirname(abspath(__file__))
 
 TIMEOUT = 10  # Time limit for the AI agent
 
+MAX_PASSES = 6 # Number of turns in a row that may be passed before a headless game is ended
+
+RECORD_VERSION = 1 # Version of the game record format
+
+characters_cache = None # Characters read from assets/characters.json, loaded on first use
+
 parser = argparse.ArgumentParser(description="A Game of Thrones: Hand of the King")
 parser.add_argument('--player1', metavar='p1', type=str, help="either human or an AI file", default='human')
 parser.add_argument('--player2', metavar='p2', type=str, help="either human or an AI file", default='human')
 parser.add_argument('-l', '--load', type=str, help="file containing starting board setup (for repeatability)", default=None)
 parser.add_argument('-s', '--save', type=str, help="file to save board setup to", default=None)
 parser.add_argument('-v', '--video', type=str, help="name of the video file to save", default=None)
+parser.add_argument('--headless', action='store_true', help="play AI against AI without graphics, delays or video")
+parser.add_argument('-r', '--record', type=str, help="file to save the game record to, for render.py", default=None)
+
+def load_characters():
+    '''
+    This function loads the characters of the game.
+    The file is read only once, every call gets its own copy of the characters.
+
+    Returns:
+        characters (dict): dictionary of the characters of every house and the companion cards
+    '''
+
+    global characters_cache
+
+    # Read the file only the first time
+    if characters_cache is None:
+        with open(join(path, "assets", "characters.json"), 'r') as file:
+            characters_cache = json.load(file)
+
+    return copy.deepcopy(characters_cache)
 
 def make_board():
     '''
@@ -38,8 +65,7 @@ def make_board():
     '''
 
     # Load the characters
-    with open(join(path, "assets", "characters.json"), 'r') as file:
-        characters = json.load(file)
+    characters = load_characters()
     
     companion_cards = characters['Companion'] # Dictionary of companion cards
 
@@ -64,23 +90,107 @@ def make_board():
 
     return cards, companion_cards
 
-def save_board(cards, filename='board'):
+def board_to_snapshot(cards):
     '''
-    This function saves the board to a file.
+    This function converts the board to a snapshot that is kept in memory.
 
     Parameters:
         cards (list): list of Card objects
-        filename (str): name of the file to save the board to
+
+    Returns:
+        snapshot (list): list of the house, name and location of every card
     '''
 
-    cards_json = []
+    snapshot = []
 
     for card in cards:
         card_json = {'house': card.get_house(), 'name': card.get_name(), 'location': card.get_location()}
-        cards_json.append(card_json)
+        snapshot.append(card_json)
+
+    return snapshot
+
+def board_from_snapshot(snapshot):
+    '''
+    This function creates the board from a snapshot.
+
+    Parameters:
+        snapshot (list): list of the house, name and location of every card
+
+    Returns:
+        cards (list): list of Card objects
+        companion_cards (dict): dictionary of companion cards
+    '''
+
+    cards = [Card(card['house'], card['name'], card['location']) for card in snapshot]
+
+    companion_cards = load_characters()['Companion'] # Dictionary of companion cards
+
+    return cards, companion_cards
+
+def save_board(cards, filename='board'):
+    '''
+    This function saves the board to a file.
+
+    Parameters:
+        cards (list): list of Card objects
+        filename (str): name of the file to save the board to
+    '''
 
     with open(join(path, "boards", filename + ".json"), 'w') as file:
-        json.dump(cards_json, file, indent=4)
+        json.dump(board_to_snapshot(cards), file, indent=4)
+
+def new_record(cards, player1, player2):
+    '''
+    This function creates the record of a game, the starting board and the moves in order.
+
+    Parameters:
+        cards (list): list of Card objects of the starting board
+        player1 (str): agent of player 1
+        player2 (str): agent of player 2
+
+    Returns:
+        record (dict): record of the game without moves
+    '''
+
+    return {
+        'version': RECORD_VERSION,
+        'board': board_to_snapshot(cards),
+        'player1': player1,
+        'player2': player2,
+        'moves': [], # Turn of the player and the move of every move made, companion moves included
+        'winner': None,
+    }
+
+def save_record(record, filename):
+    '''
+    This function saves the record of a game to a file.
+
+    Parameters:
+        record (dict): record of the game
+        filename (str): path of the file
+    '''
+
+    with open(filename, 'w') as file:
+        json.dump(record, file)
+
+def load_record(filename):
+    '''
+    This function loads the record of a game from a file.
+
+    Parameters:
+        filename (str): path of the file
+
+    Returns:
+        record (dict): record of the game
+    '''
+
+    with open(filename, 'r') as file:
+        record = json.load(file)
+
+    if record.get('version') != RECORD_VERSION:
+        raise ValueError(f"{filename} is not a version {RECORD_VERSION} game record")
+
+    return record
 
 def load_board(filename='board'):
     '''
@@ -95,16 +205,9 @@ def load_board(filename='board'):
     '''
 
     with open(join(path, "boards", filename + ".json"), 'r') as file:
-        cards = json.load(file)
-    
-    cards = [Card(card['house'], card['name'], card['location']) for card in cards]
-
-    with open(join(path, "assets", "characters.json"), 'r') as file:
-        characters = json.load(file)
-    
-    companion_cards = characters['Companion'] # Dictionary of companion cards
+        snapshot = json.load(file)
 
-    return cards, companion_cards
+    return board_from_snapshot(snapshot)
 
 def find_varys(cards):
     '''
@@ -337,6 +440,77 @@ def make_move(cards, move, player):
     # Return the selected card's house
     return selected_card.get_house()
 
+def apply_move(cards, move, player1, player2, turn, history):
+    '''
+    This function makes a move in place and records how to undo it.
+    It has the same effect as make_move followed by set_banners, but only
+    touches the house of the selected card, so a search can roll it back with undo_move.
+
+    Parameters:
+        cards (list): list of Card objects
+        move (int): location of the card
+        player1 (Player): player 1
+        player2 (Player): player 2
+        turn (int): 1 if player 1 makes the move, 2 if player 2 makes the move
+        history (list): undo stack the move is recorded on
+
+    Returns:
+        house (str): house of the selected card
+    '''
+
+    player = player1 if turn == 1 else player2
+
+    # Find Varys and the selected card
+    for i in range(len(cards)):
+        if cards[i].get_name() == 'Varys':
+            varys_card = cards[i]
+
+        if cards[i].get_location() == move:
+            selected_card = cards[i]
+
+    varys_location = varys_card.get_location()
+    house = selected_card.get_house()
+
+    # Get the range of locations between Varys and the selected card
+    if varys_location // 6 == move // 6:
+        step = 1 if move > varys_location else -1
+
+    else:
+        step = 6 if move > varys_location else -6
+
+    between = range(varys_location + step, move, step)
+
+    removed = [] # (index, card) pairs of the removed cards, in board order
+
+    for i in range(len(cards)):
+        location = cards[i].get_location()
+
+        # The selected card and the cards of the same house between Varys and the selected card are taken
+        if location == move or (location in between and cards[i].get_house() == house):
+            removed.append((i, cards[i]))
+
+            if location != move:
+                player.add_card(cards[i])
+
+    # Add the selected card to the player's cards
+    player.add_card(selected_card)
+
+    # Move Varys
+    varys_card.set_location(move)
+
+    # Remove the cards, starting from the end so the indices stay valid
+    for i, _ in reversed(removed):
+        del cards[i]
+
+    banners = (house, player1.get_banners()[house], player2.get_banners()[house])
+
+    # Set the banner of the selected house
+    set_house_banner(player1, player2, house, turn)
+
+    history.append((removed, [(varys_card, varys_location)], player, house, len(removed), banners, None))
+
+    return house
+
 def make_companion_move(cards, companion_cards, move, player):
     '''
     This function makes the move of the companion card.
@@ -421,6 +595,113 @@ def make_companion_move(cards, companion_cards, move, player):
     
     return house
 
+def apply_companion_move(cards, companion_cards, move, player1, player2, turn, history):
+    '''
+    This function uses a companion card in place and records how to undo it.
+    Like in the game loop, the used companion card and the companion cards that cannot be used
+    anymore are removed from the companion cards, undo_move brings them all back.
+
+    Parameters:
+        cards (list): list of Card objects
+        companion_cards (dict): dictionary of companion cards
+        move (list): companion card followed by its choices
+        player1 (Player): player 1
+        player2 (Player): player 2
+        turn (int): 1 if player 1 makes the move, 2 if player 2 makes the move
+        history (list): undo stack the move is recorded on
+
+    Returns:
+        house (str/None): house of the selected card
+    '''
+
+    player = player1 if turn == 1 else player2
+    selected_companion = move[0] # Selected companion card
+
+    # Keep the companion cards as they were, their order is restored on undo
+    companions = list(companion_cards.items())
+
+    removed = [] # (index, card) pairs of the removed cards
+    moved = [] # (card, location) pairs of the swapped cards
+    house = None # House of the selected card
+    added = 0 # Number of cards added to the player
+
+    if selected_companion in ('Jon', 'Gendry'):
+        if selected_companion == 'Jon':
+            house = find_card(cards, move[1]).get_house()
+            added = 2
+
+        else:
+            house = 'Baratheon'
+            added = 1
+
+    elif selected_companion == 'Ramsay':
+        first_card = find_card(cards, move[1])
+        second_card = find_card(cards, move[2])
+
+        moved = [(first_card, first_card.get_location()), (second_card, second_card.get_location())]
+
+    elif selected_companion in ('Sandor', 'Jaqen'):
+        locations = move[1:2] if selected_companion == 'Sandor' else move[1:3]
+
+        removed = [(i, cards[i]) for i in range(len(cards)) if cards[i].get_location() in locations]
+
+    del companion_cards[selected_companion]
+
+    make_companion_move(cards, companion_cards, move, player)
+
+    # Remove the companion cards that cannot be used
+    remove_unusable_companion_cards(cards, companion_cards)
+
+    banners = None
+
+    if house is not None:
+        banners = (house, player1.get_banners()[house], player2.get_banners()[house])
+
+        # Set the banner of the selected house
+        set_house_banner(player1, player2, house, turn)
+
+    history.append((removed, moved, player, house, added, banners, companions))
+
+    return house
+
+def undo_move(cards, companion_cards, player1, player2, history):
+    '''
+    This function undoes the last move recorded by apply_move or apply_companion_move.
+
+    Parameters:
+        cards (list): list of Card objects
+        companion_cards (dict/None): dictionary of companion cards
+        player1 (Player): player 1
+        player2 (Player): player 2
+        history (list): undo stack the move was recorded on
+    '''
+
+    removed, moved, player, house, added, banners, companions = history.pop()
+
+    # Put the removed cards back where they were
+    for i, card in removed:
+        cards.insert(i, card)
+
+    # Move the cards back
+    for card, location in moved:
+        card.set_location(location)
+
+    # Take the cards back from the player
+    if added:
+        del player.get_cards()[house][-added:]
+
+    # Restore the banners
+    if banners is not None:
+        house, player1_banner, player2_banner = banners
+
+        player1.get_banners()[house] = player1_banner
+        player2.get_banners()[house] = player2_banner
+
+    # Restore the companion cards
+    if companions is not None:
+        companion_cards.clear()
+        companion_cards.update(companions)
+
 def remove_unusable_companion_cards(cards, companion_cards):
     '''
     This function removes the companion cards that cannot be used.
@@ -539,6 +820,30 @@ def set_banners(player1, player2, last_house, last_turn):
 
     return player1_status, player2_status
 
+def set_house_banner(player1, player2, house, turn):
+    '''
+    This function sets the banner of the house of the last chosen card.
+    It gives the same result as set_banners for that house, the banners of the other houses cannot change.
+
+    Parameters:
+        player1 (Player): player 1
+        player2 (Player): player 2
+        house (str): house of the last chosen card
+        turn (int): last turn of the player
+    '''
+
+    player1_count = len(player1.get_cards()[house])
+    player2_count = len(player2.get_cards()[house])
+
+    # The player with the more cards of the house gets the banner, the last player if the number of cards is the same
+    if player1_count > player2_count or (player1_count == player2_count and turn == 1):
+        player1.get_house_banner(house)
+        player2.remove_house_banner(house)
+
+    else:
+        player1.remove_house_banner(house)
+        player2.get_house_banner(house)
+
 def clear_screen():
     '''
     This function clears the screen.
@@ -653,12 +958,35 @@ def validate_agent_move(cards, companion_cards, given_move):
     
     return True # All checks passed
 
+def print_move_stats(turn, move_time, stats):
+    '''
+    This function prints how long a move took and what the search of the agent did.
+
+    Parameters:
+        turn (int): 1 if player 1 made the move, 2 if player 2 made the move
+        move_time (float): seconds the move took
+        stats (dict/None): search statistics from the agent, None if it sent none
+    '''
+
+    text = f"Player {turn} move: {move_time:.3f}s"
+
+    if stats is not None:
+        text += (f", depth {stats['depth']} (max ply {stats['max_ply']}), {stats['nodes']} nodes, "
+                 f"{stats['nodes_per_second']:.0f} nodes/s")
+
+    # Agents without a transposition table do not send its counters
+    if stats is not None and 'tt_probes' in stats:
+        text += (f", TT {stats['tt_hits']}/{stats['tt_probes']} hits, "
+                 f"{stats['tt_stores']} stores, {stats['cutoffs']} cutoffs ({stats['first_move_cutoff_rate']:.0%} by the first move)")
+
+    print(text)
+
 def try_get_move(agent, cards, player1, player2, companion_cards, choose_companion):
     '''
     This function tries to get the move from the AI agent.
 
     Parameters:
-        agent (module): AI agent
+        agent (AgentWorker): AI agent
         cards (list): list of Card objects
         player1 (Player): player 1
         player2 (Player): player 2
@@ -666,22 +994,192 @@ def try_get_move(agent, cards, player1, player2, companion_cards, choose_compani
         choose_companion (bool): flag to choose a companion card
 
     Returns:
-        move (int/list): move from the AI agent
+        move (int/list): move from the AI agent, the last move it published if it ran out of time
     '''
-    
-    # Try to get the move from the AI agent in TIMEOUT seconds
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(agent.get_move, copy.deepcopy(cards), copy.deepcopy(player1),
-                                 copy.deepcopy(player2), copy.deepcopy(companion_cards), choose_companion)
 
-        try:
-            move = future.result(timeout=TIMEOUT)
-        
-        except concurrent.futures.TimeoutError:
-            move = None
-    
-    return move
+    # Agents in worker processes get a copy of the game and keep to TIMEOUT themselves,
+    # a worker that runs out of time is killed, so its search cannot change the next one
+    return agent.get_move(cards, player1, player2, companion_cards, choose_companion)
             
+def get_board(board=None):
+    '''
+    This function gets the board a game starts from.
+
+    Parameters:
+        board (str/list/None): name of a board file, a board snapshot, or None for a new random board
+
+    Returns:
+        cards (list): list of Card objects
+        companion_cards (dict): dictionary of companion cards
+    '''
+
+    if board is None:
+        return make_board()
+
+    if isinstance(board, str):
+        return load_board(board)
+
+    return board_from_snapshot(board)
+
+def play_game(agent1, agent2, board=None, verbose=False):
+    '''
+    This function plays a game between two AI agents with the rules of the game loop,
+    without graphics, delays or video.
+    A move that is missing or not valid passes the turn, like a timeout, and a companion card
+    that was not chosen is lost. The game ends after MAX_PASSES passed turns in a row.
+    Agents given as modules are run in worker processes for the game, like the agents of main,
+    since only a process can be stopped when it runs out of time. The workers import the module
+    again, so settings changed on the module object are not seen.
+
+    Parameters:
+        agent1 (module/AgentWorker): AI agent of player 1
+        agent2 (module/AgentWorker): AI agent of player 2
+        board (str/list/None): name of a board file, a board snapshot, or None for a new random board
+        verbose (bool): flag to print the status of the cards after every move
+
+    Returns:
+        result (dict): winner, banners and cards of the players, move times, search statistics, number of timeouts and errors, and the game record
+    '''
+
+    if not isinstance(agent1, AgentWorker) or not isinstance(agent2, AgentWorker):
+        workers = [agent if isinstance(agent, AgentWorker) else AgentWorker(agent.__name__, TIMEOUT) for agent in (agent1, agent2)]
+
+        try:
+            return play_game(workers[0], workers[1], board, verbose)
+
+        finally:
+            # Stop only the workers started for this game
+            for worker, agent in zip(workers, (agent1, agent2)):
+                if worker is not agent:
+                    worker.close()
+
+    cards, companion_cards = get_board(board)
+
+    # Set up the players
+    player1 = Player(agent1.__name__)
+    player2 = Player(agent2.__name__)
+
+    record = new_record(cards, agent1.__name__, agent2.__name__) # Record of the game
+
+    turn = 1 # 1: player 1's turn, 2: player 2's turn
+    choose_companion = False # Choose Companion flag
+    selected_house = None # House of the last selected card
+    move_times = [[], []] # Seconds every move took for player 1 and player 2
+    search_stats = [[], []] # Search statistics the agents sent for their moves, None if there were none
+    timeouts = [0, 0] # Number of missing or invalid moves of player 1 and player 2
+    errors = [0, 0] # Number of moves player 1 and player 2 failed with an exception
+    passes = 0 # Number of turns passed in a row
+
+    while True:
+        # Get the possible moves for the player
+        moves = get_possible_moves(cards)
+
+        # Check if the player has no moves left to make
+        if len(moves) == 0 and ((not choose_companion) or (len(companion_cards) == 0)):
+            break
+
+        # Get the move from the AI agent and measure how long it took
+        agent = agent1 if turn == 1 else agent2
+        start = time.perf_counter()
+
+        failed = False # Flag for an agent that failed with an exception
+
+        try:
+            move = try_get_move(agent, cards, player1, player2, companion_cards, choose_companion)
+
+        except Exception:
+            move, failed = None, True
+
+        move_times[turn - 1].append(time.perf_counter() - start)
+        search_stats[turn - 1].append(agent.get_stats() if hasattr(agent, 'get_stats') and not failed else None)
+        mover = turn # Player who made the move
+
+        if failed:
+            valid = False
+
+        elif choose_companion:
+            valid = isinstance(move, list) and len(move) > 0 and validate_agent_move(cards, companion_cards, move)
+
+        else:
+            valid = move in moves
+
+        # A failed, missing or invalid move passes the turn
+        if not valid:
+            if failed:
+                errors[turn - 1] += 1
+
+            else:
+                timeouts[turn - 1] += 1
+
+            passes += 1
+            turn = 2 if turn == 1 else 1
+            choose_companion = False # The companion card is lost, the opponent cannot choose it
+
+            # Agents that only pass would never end the game
+            if passes >= MAX_PASSES:
+                break
+
+            continue
+
+        passes = 0
+
+        record['moves'].append([turn, move])
+
+        # If the move is companion card
+        if choose_companion:
+            # Remove the companion card from the list
+            del companion_cards[move[0]]
+
+            # Make the companion move
+            is_house = make_companion_move(cards, companion_cards, move, player1 if turn == 1 else player2)
+
+            # Remove the companion cards that cannot be used
+            remove_unusable_companion_cards(cards, companion_cards)
+
+            # Set the banners for the players
+            player1_status, player2_status = set_banners(player1, player2, is_house if is_house is not None else selected_house, turn)
+
+            # Melisandre gives the player another turn
+            if move[0] != 'Melisandre':
+                turn = 2 if turn == 1 else 1
+
+            choose_companion = False # Reset the flag
+
+        else:
+            # Make the move
+            selected_house = make_move(cards, move, player1 if turn == 1 else player2)
+
+            # Remove the companion cards that cannot be used
+            remove_unusable_companion_cards(cards, companion_cards)
+
+            # Set the banners for the players
+            player1_status, player2_status = set_banners(player1, player2, selected_house, turn)
+
+            # If there are no cards of the house and there are companion cards left
+            if house_card_count(cards, selected_house) == 0 and len(companion_cards) != 0:
+                choose_companion = True # Player must choose a companion card
+
+            else:
+                turn = 2 if turn == 1 else 1
+
+        if verbose:
+            # Print the status of the cards and how the move was found
+            print_cards_status(player1_status, player2_status)
+            print_move_stats(mover, move_times[mover - 1][-1], search_stats[mover - 1][-1])
+
+    record['winner'] = calculate_winner(player1, player2)
+
+    return {
+        'winner': record['winner'],
+        'banners': [player1.get_banners(), player2.get_banners()],
+        'cards': [{house: len(house_cards) for house, house_cards in player.get_cards().items()} for player in (player1, player2)],
+        'move_times': move_times,
+        'search_stats': search_stats,
+        'timeouts': timeouts,
+        'errors': errors,
+        'record': record,
+    }
+
 def main(args):
     '''
     This function runs the game.
@@ -711,18 +1209,6 @@ def main(args):
         except:
             print("Error saving board.")
     
-    # Set up the graphics
-    board = pygraphics.init_board()
-
-    # Clear the screen
-    clear_screen()
-
-    # Draw the board
-    pygraphics.draw_board(board, cards, companion_cards,  '0', None)
-
-    # Show the initial board for 2 seconds
-    pygraphics.show_board(2)
-
     # Check if the players are human or AI
     if args.player1 == 'human':
         player1_agent = None
@@ -756,203 +1242,306 @@ def main(args):
             print("AI file does not have the get_move function.")
             return
     
+    if args.headless and (player1_agent is None or player2_agent is None):
+        print("Headless games need two AI players.")
+        return
+
+    # Run every AI agent in its own process for the whole game
+    if player1_agent is not None:
+        player1_agent = AgentWorker(args.player1, TIMEOUT)
+
+    if player2_agent is not None:
+        player2_agent = AgentWorker(args.player2, TIMEOUT)
+
+    try:
+        if args.headless:
+            # Play the game without graphics
+            result = play_game(player1_agent, player2_agent, board_to_snapshot(cards), verbose=True)
+            winner = result['winner']
+
+            print(f"Player {winner} ({args.player1 if winner == 1 else args.player2}) wins.")
+
+            if args.record:
+                save_record(result['record'], args.record)
+
+            # Print how long the moves of every player took
+            for i, agent_name in enumerate((args.player1, args.player2)):
+                summary = summarize(result['move_times'][i])
+
+                if summary['count']:
+                    print(f"Player {i + 1} ({agent_name}) move times: p50 {summary['p50']:.3f}s, "
+                          f"p95 {summary['p95']:.3f}s, p99 {summary['p99']:.3f}s, max {summary['max']:.3f}s")
+
+        else:
+            play_drawn_game(args, cards, companion_cards, player1_agent, player2_agent)
+
+    finally:
+        for agent in (player1_agent, player2_agent):
+            if agent is not None:
+                agent.close()
+
+def play_drawn_game(args, cards, companion_cards, player1_agent, player2_agent):
+    '''
+    This function plays the game with graphics and saves its video.
+
+    Parameters:
+        args (Namespace): command line arguments
+        cards (list): list of Card objects
+        companion_cards (dict): dictionary of companion cards
+        player1_agent (AgentWorker/None): AI agent of player 1, None for a human player
+        player2_agent (AgentWorker/None): AI agent of player 2, None for a human player
+    '''
+
+    # Import the graphics only for the drawn game, they need pygame and moviepy
+    import pygraphics
+
+    # Set up the graphics
+    board = pygraphics.init_board()
+
+    try:
+        pygraphics.start_video(get_video_name(args)) # Encode the video while the game is played
+    
+    except:
+        print("Error saving video.")
+
     # Set up the players
     player1 = Player(args.player1)
     player2 = Player(args.player2)
 
-    # Set up the turn
-    turn = 1 # 1: player 1's turn, 2: player 2's turn
+    # Record of the game, saved if a record file is given
+    record = new_record(cards, args.player1, args.player2)
+
+    # Clear the screen
+    clear_screen()
 
     # Draw the board
-    pygraphics.draw_board(board, cards, companion_cards, '1')
+    pygraphics.draw_board(board, cards, companion_cards,  '0', None)
+
+    try:
+        # Show the initial board for 2 seconds
+        pygraphics.show_board(2)
 
-    # Set Choose Companion flag
-    choose_companion = False
+        # Set up the turn
+        turn = 1 # 1: player 1's turn, 2: player 2's turn
 
-    while True:
-        # Get the possible moves for the player
-        moves = get_possible_moves(cards)
+        # Draw the board
+        pygraphics.draw_board(board, cards, companion_cards, '1')
 
-        # Check if the player has no moves left to make
-        if (len(moves) == 0 and ((not choose_companion) or (len(companion_cards) == 0))):
-            # Get the winner of the game
-            winner = calculate_winner(player1, player2)
+        # Set Choose Companion flag
+        choose_companion = False
+
+        while True:
+            # Get the possible moves for the player
+            moves = get_possible_moves(cards)
+
+            # Check if the player has no moves left to make
+            if (len(moves) == 0 and ((not choose_companion) or (len(companion_cards) == 0))):
+                # Get the winner of the game
+                winner = calculate_winner(player1, player2)
+                record['winner'] = winner
             
-            # Display the winner
-            pygraphics.display_winner(board, winner, player1.get_agent() if winner == 1 else player2.get_agent())
+                # Display the winner
+                pygraphics.display_winner(board, winner, player1.get_agent() if winner == 1 else player2.get_agent())
 
-            # Show the board for 5 seconds
-            pygraphics.show_board(5)
+                # Show the board for 5 seconds
+                pygraphics.show_board(5)
 
-            break
+                break
 
-        # Get the player's move
-        if turn == 1:
-            # Check if the player is human or AI
-            if player1_agent is None:
-                # Wait for the player to make a move with the mouse
-                move = pygraphics.get_player_move(moves, companion_cards if choose_companion else None)
+            # Get the player's move
+            if turn == 1:
+                # Check if the player is human or AI
+                if player1_agent is None:
+                    # Wait for the player to make a move with the mouse
+                    move = pygraphics.get_player_move(moves, companion_cards if choose_companion else None)
             
-            else:
-                # Get the move from the AI agent
-                move = try_get_move(player1_agent, cards, player1, player2, companion_cards, choose_companion)
+                else:
+                    # Get the move from the AI agent
+                    move = try_get_move(player1_agent, cards, player1, player2, companion_cards, choose_companion)
 
-                # If the move is None, change the turn
-                if move is None:
-                    turn = 2
+                    # If the move is None, change the turn
+                    if move is None:
+                        turn = 2
         
-        else:
-            # Check if the player is human or AI
-            if player2_agent is None:
-                # Wait for the player to make a move with the mouse
-                move = pygraphics.get_player_move(moves, companion_cards if choose_companion else None)
-            
             else:
-                # Get the move from the AI agent
-                move = try_get_move(player2_agent, cards, player1, player2, companion_cards, choose_companion)
+                # Check if the player is human or AI
+                if player2_agent is None:
+                    # Wait for the player to make a move with the mouse
+                    move = pygraphics.get_player_move(moves, companion_cards if choose_companion else None)
+            
+                else:
+                    # Get the move from the AI agent
+                    move = try_get_move(player2_agent, cards, player1, player2, companion_cards, choose_companion)
 
-                # If the move is None, change the turn
-                if move is None:
-                    turn = 1
+                    # If the move is None, change the turn
+                    if move is None:
+                        turn = 1
         
-        # If the move is companion card
-        if choose_companion:
-            # Check if the move is valid
-            if move[0] in companion_cards.keys():
-                choices = companion_cards[move[0]]['Choice'] # Number of choices for the companion card
-
-                # If the player is human, get the selected cards
-                if (turn == 1 and player1_agent is None) or (turn == 2 and player2_agent is None):
-                    selectable_cards = [] # List to hold the selectable cards
-                    selectable_companion_cards = {key: value for key, value in companion_cards.items() if key != move[0]} # Dictionary to hold the selectable companion cards
-
-                    for card in cards:
-                        if card.get_name() == 'Varys' and move[0] == 'Ramsay': # Ramsay can change the location of two cards
-                            selectable_cards.append(card.get_location())
+            # If the move is companion card
+            if choose_companion:
+                # Check if the move is valid
+                if move[0] in companion_cards.keys():
+                    choices = companion_cards[move[0]]['Choice'] # Number of choices for the companion card
+
+                    # If the player is human, get the selected cards
+                    if (turn == 1 and player1_agent is None) or (turn == 2 and player2_agent is None):
+                        selectable_cards = [] # List to hold the selectable cards
+                        selectable_companion_cards = {key: value for key, value in companion_cards.items() if key != move[0]} # Dictionary to hold the selectable companion cards
+
+                        for card in cards:
+                            if card.get_name() == 'Varys' and move[0] == 'Ramsay': # Ramsay can change the location of two cards
+                                selectable_cards.append(card.get_location())
                         
-                        elif card.get_name() != 'Varys':
-                            selectable_cards.append(card.get_location())
+                            elif card.get_name() != 'Varys':
+                                selectable_cards.append(card.get_location())
 
-                    for i in range(choices):
-                        # Condition for selecting a companion card
-                        companion_selecting_condition = (move[0] == 'Jaqen' and i + 1 == choices)
+                        for i in range(choices):
+                            # Condition for selecting a companion card
+                            companion_selecting_condition = (move[0] == 'Jaqen' and i + 1 == choices)
 
-                        # Set the footer's text
-                        footer_text = 'CC' if companion_selecting_condition else f'BC{i + 1}'
+                            # Set the footer's text
+                            footer_text = 'CC' if companion_selecting_condition else f'BC{i + 1}'
 
-                        # Draw the board
-                        if turn == 1:
-                            pygraphics.draw_board(board, cards, selectable_companion_cards, footer_text, companion_selecting_condition)
+                            # Draw the board
+                            if turn == 1:
+                                pygraphics.draw_board(board, cards, selectable_companion_cards, footer_text, companion_selecting_condition)
                         
-                        else:
-                            pygraphics.draw_board(board, cards, selectable_companion_cards, footer_text, companion_selecting_condition)
+                            else:
+                                pygraphics.draw_board(board, cards, selectable_companion_cards, footer_text, companion_selecting_condition)
 
-                        # Wait for the player to make a move with the mouse
-                        selected = pygraphics.get_player_move(selectable_cards, selectable_companion_cards if companion_selecting_condition else None)
+                            # Wait for the player to make a move with the mouse
+                            selected = pygraphics.get_player_move(selectable_cards, selectable_companion_cards if companion_selecting_condition else None)
 
-                        if not companion_selecting_condition:
-                            selectable_cards.remove(selected) # Remove the selected card from the list
+                            if not companion_selecting_condition:
+                                selectable_cards.remove(selected) # Remove the selected card from the list
                         
-                        else:
-                            selected = selected[0] # Get the selected card
+                            else:
+                                selected = selected[0] # Get the selected card
+
+                            move.append(selected) # Add the selected card to the list
+
+                    elif not validate_agent_move(cards, companion_cards, move):
+                        continue
+
+                    record['moves'].append([turn, list(move)])
+
+                    # Remove the companion card from the list
+                    del companion_cards[move[0]]
 
-                        move.append(selected) # Add the selected card to the list
+                    # Make the companion move
+                    is_house = make_companion_move(cards, companion_cards, move, player1 if turn == 1 else player2)
 
-                elif not validate_agent_move(cards, companion_cards, move):
-                    continue
+                    # Remove the companion cards that cannot be used
+                    remove_unusable_companion_cards(cards, companion_cards)
 
-                # Remove the companion card from the list
-                del companion_cards[move[0]]
+                    # Set the banners for the players
+                    player1_status, player2_status = set_banners(player1, player2, is_house if is_house is not None else selected_house, turn)
 
-                # Make the companion move
-                is_house = make_companion_move(cards, companion_cards, move, player1 if turn == 1 else player2)
+                    # Print the status of the cards
+                    print_cards_status(player1_status, player2_status)
+
+                    # Melisandre gives the player another turn
+                    if move[0] != 'Melisandre':
+                        # Change the turn
+                        turn = 2 if turn == 1 else 1
+
+                    choose_companion = False # Reset the flag
+
+                # Draw the board
+                if turn == 1:
+                    pygraphics.draw_board(board, cards, companion_cards, '1', choose_companion)
+            
+                else:
+                    pygraphics.draw_board(board, cards, companion_cards, '2', choose_companion)
+            
+                # Show the board for 0.5 seconds
+                pygraphics.show_board(0.5)
+
+            # Check if the move is valid
+            if move in moves:
+                record['moves'].append([turn, move])
+
+                # Make the move
+                selected_house = make_move(cards, move, player1 if turn == 1 else player2)
 
                 # Remove the companion cards that cannot be used
                 remove_unusable_companion_cards(cards, companion_cards)
 
                 # Set the banners for the players
-                player1_status, player2_status = set_banners(player1, player2, is_house if is_house is not None else selected_house, turn)
+                player1_status, player2_status = set_banners(player1, player2, selected_house, turn)
 
                 # Print the status of the cards
                 print_cards_status(player1_status, player2_status)
 
-                # Melisandre gives the player another turn
-                if move[0] != 'Melisandre':
+                # If there are no cards of the house and there are companion cards left
+                if house_card_count(cards, selected_house) == 0 and len(companion_cards) != 0:
+                    choose_companion = True # Player must choose a companion card
+            
+                else:
                     # Change the turn
                     turn = 2 if turn == 1 else 1
 
-                choose_companion = False # Reset the flag
+                    choose_companion = False # Reset the flag
 
-            # Draw the board
-            if turn == 1:
-                pygraphics.draw_board(board, cards, companion_cards, '1', choose_companion)
+                # Draw the board
+                if turn == 1:
+                    pygraphics.draw_board(board, cards, companion_cards, 'CC' if choose_companion else '1', choose_companion)
             
-            else:
-                pygraphics.draw_board(board, cards, companion_cards, '2', choose_companion)
+                else:
+                    pygraphics.draw_board(board, cards, companion_cards, 'CC' if choose_companion else '2', choose_companion)
             
-            # Show the board for 0.5 seconds
-            pygraphics.show_board(0.5)
+                # Show the board for 0.5 seconds
+                pygraphics.show_board(0.5)
 
-        # Check if the move is valid
-        if move in moves:
-            # Make the move
-            selected_house = make_move(cards, move, player1 if turn == 1 else player2)
+    except pygraphics.GameClosed: # The window was closed, the video and the record of the game so far are still saved
+        pass
 
-            # Remove the companion cards that cannot be used
-            remove_unusable_companion_cards(cards, companion_cards)
+    # Close the board
+    pygraphics.close_board()
 
-            # Set the banners for the players
-            player1_status, player2_status = set_banners(player1, player2, selected_house, turn)
+    try:
+        pygraphics.save_video() # Finish the video of the game
+    
+    except:
+        print("Error saving video.")
 
-            # Print the status of the cards
-            print_cards_status(player1_status, player2_status)
+    if args.record:
+        try:
+            save_record(record, args.record) # Save the record of the game
+        
+        except:
+            print("Error saving record.")
 
-            # If there are no cards of the house and there are companion cards left
-            if house_card_count(cards, selected_house) == 0 and len(companion_cards) != 0:
-                choose_companion = True # Player must choose a companion card
-            
-            else:
-                # Change the turn
-                turn = 2 if turn == 1 else 1
+def get_video_name(args):
+    '''
+    This function gets the name of the video file of the game.
 
-                choose_companion = False # Reset the flag
+    Parameters:
+        args (Namespace): command line arguments
 
-            # Draw the board
-            if turn == 1:
-                pygraphics.draw_board(board, cards, companion_cards, 'CC' if choose_companion else '1', choose_companion)
-            
-            else:
-                pygraphics.draw_board(board, cards, companion_cards, 'CC' if choose_companion else '2', choose_companion)
-            
-            # Show the board for 0.5 seconds
-            pygraphics.show_board(0.5)
-    
-    # Close the board
-    pygraphics.close_board()
+    Returns:
+        file_name (str): name of the video file, Agent1_vs_Agent2 if not provided
+    '''
 
     file_name = args.video # Name of the video file
 
     if file_name is None: # If not provided
         # Set the name of the video file as Agent1_vs_Agent2
-        if player1.get_agent() != 'human':
-            file_name = player1.get_agent()[max(0, player1.get_agent().find('/'), player1.get_agent().find('\\')):]
+        if args.player1 != 'human':
+            file_name = args.player1[max(0, args.player1.find('/'), args.player1.find('\\')):]
         
         else:
-            file_name = player1.get_agent()
+            file_name = args.player1
         
         file_name += '_vs_'
 
-        if player2.get_agent() != 'human':
-            file_name += player2.get_agent()[max(0, player2.get_agent().find('/'), player2.get_agent().find('\\')):]
+        if args.player2 != 'human':
+            file_name += args.player2[max(0, args.player2.find('/'), args.player2.find('\\')):]
         
         else:
-            file_name += player2.get_agent()
-    
-    try:
-        pygraphics.save_video(file_name) # Save the video of the game
-    
-    except:
-        print("Error saving video.")
+            file_name += args.player2
+
+    return file_name
 
 if __name__ == "__main__":
     main(parser.parse_args())
\ No newline at end of file
@@ -0,0 +1,379 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from math import log, sqrt
+from multiprocessing import get_context
+import random
+import time
+from main import TIMEOUT
+from state import GameState, get_locations
+from agent import get_root_moves, play_search_move
+
+# Seconds the search may use for one move, the rest of TIMEOUT is left for the game loop
+MOVE_TIME = TIMEOUT * 0.8
+
+# Exploration constant of the UCT formula
+UCT_C = 1.4
+
+# Chance that a playout move takes the most cards instead of a random one
+GREEDY_PLAYOUTS = 0.5
+
+# Number of processes that search their own tree of the root, 1 searches in the calling process
+MCTS_WORKERS = 1
+
+# Number of iterations between two published moves
+PUBLISH_INTERVAL = 256
+
+# Called with the best move found so far, set by the game to play it if get_move runs out of time
+publish_move = None
+
+class Node:
+    '''
+    This class represents a position in the search tree.
+    The results are counted for the player who made the move that leads to the position,
+    so the parent picks the child that is best for the player to move in the parent.
+    '''
+
+    def __init__(self, move, parent, player, choose_companion, moves):
+        '''
+        This function initializes the node.
+
+        Parameters:
+            move (int/list/None): move that leads to the position, None for the root
+            parent (Node/None): node of the previous position, None for the root
+            player (int): 1 if player 1 is to move, -1 if player 2 is to move
+            choose_companion (bool): flag to choose a companion card
+            moves (list): possible moves of the position
+        '''
+
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.choose_companion = choose_companion
+        self.untried = moves # Moves without a child yet, taken from the end
+        self.children = [] # Nodes of the tried moves
+        self.visits = 0 # Number of playouts through the node
+        self.wins = 0.0 # Wins of the player who made the move, a draw counts half
+
+    def select_child(self):
+        '''
+        This function selects the child with the highest UCT score.
+
+        Returns:
+            child (Node): the selected child
+        '''
+
+        log_visits = log(self.visits)
+
+        return max(self.children, key=lambda child: child.wins / child.visits + UCT_C * sqrt(log_visits / child.visits))
+
+def get_reward(winner, player):
+    '''
+    This function scores the result of a game for a player.
+
+    Parameters:
+        winner (int/None): 1 if player 1 won, 2 if player 2 won, None if nobody won
+        player (int): 1 for player 1, -1 for player 2
+
+    Returns:
+        reward (float): 1 for a win, 0.5 for a draw, 0 for a loss
+    '''
+
+    if winner is None:
+        return 0.5
+
+    return 1.0 if (winner == 1) == (player == 1) else 0.0
+
+def random_companion_move(state, rng):
+    '''
+    This function picks a random legal companion move without listing all of them.
+
+    Parameters:
+        state (GameState): the position
+        rng (Random): random number generator
+
+    Returns:
+        move (list/None): companion card followed by its choices, None if no companion card is left
+    '''
+
+    if not state.companions:
+        return None
+
+    companion = rng.choice(list(state.companions))
+    cards = get_locations(state.get_occupied()) # Locations of the cards except Varys
+
+    if companion == 'Jaqen':
+        others = [other for other in state.companions if other != 'Jaqen']
+        return [companion] + rng.sample(cards, 2) + [rng.choice(others)]
+
+    elif companion == 'Ramsay':
+        return [companion] + rng.sample(cards + [state.varys], 2)
+
+    elif companion in ('Jon', 'Sandor'):
+        return [companion, rng.choice(cards)]
+
+    return [companion]
+
+def playout(state, player, choose_companion, rng):
+    '''
+    This function plays the game to the end with random moves and takes them back.
+    A share of the moves takes the most cards, like a greedy player would.
+
+    Parameters:
+        state (GameState): the position
+        player (int): 1 if player 1 is to move, -1 if player 2 is to move
+        choose_companion (bool): flag to choose a companion card
+        rng (Random): random number generator
+
+    Returns:
+        winner (int/None): 1 if player 1 won, 2 if player 2 won, None if nobody won
+        ply (int): number of moves played
+    '''
+
+    ply = 0
+
+    while True:
+        if choose_companion:
+            move = random_companion_move(state, rng)
+
+        else:
+            moves = state.get_possible_moves()
+
+            if not moves:
+                move = None
+
+            elif rng.random() < GREEDY_PLAYOUTS:
+                move = max(moves, key=lambda location: state.get_captures(location)[1].bit_count())
+
+            else:
+                move = rng.choice(moves)
+
+        if move is None:
+            break
+
+        player, choose_companion = play_search_move(state, move, player, choose_companion)
+        ply += 1
+
+    winner = state.calculate_winner()
+
+    for _ in range(ply):
+        state.undo_move()
+
+    return winner, ply
+
+def new_node(state, move, parent, player, choose_companion, rng):
+    '''
+    This function creates the node of a position, with its moves in random order.
+
+    Parameters:
+        state (GameState): the position
+        move (int/list/None): move that leads to the position
+        parent (Node/None): node of the previous position
+        player (int): 1 if player 1 is to move, -1 if player 2 is to move
+        choose_companion (bool): flag to choose a companion card
+        rng (Random): random number generator
+
+    Returns:
+        node (Node): the node
+    '''
+
+    moves = get_root_moves(state, choose_companion)
+    rng.shuffle(moves)
+
+    return Node(move, parent, player, choose_companion, moves)
+
+def search(state, player, deadline, seed, choose_companion=False, publish=False):
+    '''
+    This function runs UCT iterations on a tree of the position until the deadline.
+    It runs in the calling process or in a worker process of the root-parallel search.
+
+    Parameters:
+        state (GameState): the position, it is the same again when the search returns
+        player (int): 1 if player 1 is to move, -1 if player 2 is to move
+        deadline (float): time.time() the search stops at
+        seed (int): seed of the random moves
+        choose_companion (bool): flag to choose a companion card
+        publish (bool): flag to publish the most visited move while searching
+
+    Returns:
+        results (list): (move, visits, wins) of every root move that was tried
+        stats (dict): number of playouts, deepest tree node and deepest playout move
+    '''
+
+    rng = random.Random(seed)
+    root = new_node(state, None, None, player, choose_companion, rng)
+    iterations = 0
+    depth = 0
+    max_ply = 0
+
+    while time.time() < deadline:
+        node = root
+        ply = 0
+
+        # Selection: follow the best children while every move of the node was tried
+        while not node.untried and node.children:
+            node = node.select_child()
+            play_search_move(state, node.move, node.parent.player, node.parent.choose_companion)
+            ply += 1
+
+        # Expansion: add one untried move
+        if node.untried:
+            move = node.untried.pop()
+            next_player, next_choose_companion = play_search_move(state, move, node.player, node.choose_companion)
+            child = new_node(state, move, node, next_player, next_choose_companion, rng)
+            node.children.append(child)
+            node = child
+            ply += 1
+
+        # Simulation
+        winner, playout_ply = playout(state, node.player, node.choose_companion, rng)
+
+        for _ in range(ply):
+            state.undo_move()
+
+        # Backpropagation
+        while node.parent is not None:
+            node.visits += 1
+            node.wins += get_reward(winner, node.parent.player)
+            node = node.parent
+
+        root.visits += 1
+        iterations += 1
+        depth = max(depth, ply)
+        max_ply = max(max_ply, ply + playout_ply)
+
+        if publish and iterations % PUBLISH_INTERVAL == 0:
+            publish_best_move(root.children)
+
+    results = [(child.move, child.visits, child.wins) for child in root.children]
+
+    return results, {'nodes': iterations, 'depth': depth, 'max_ply': max_ply}
+
+def publish_best_move(children):
+    '''
+    This function reports the most visited root move, the game plays it if get_move runs out of time.
+
+    Parameters:
+        children (list): nodes of the root moves
+    '''
+
+    if publish_move is not None and children:
+        publish_move(max(children, key=lambda child: child.visits).move)
+
+def get_move_key(move):
+    '''
+    This function gets a hashable key of a move, companion moves are lists.
+
+    Parameters:
+        move (int/list): the move
+
+    Returns:
+        key (int/tuple): key of the move
+    '''
+
+    return tuple(move) if isinstance(move, list) else move
+
+# Processes of the root-parallel search, started by the first parallel move
+search_workers = []
+
+# Statistics of the search of the last move
+search_stats = None
+
+def parallel_search(state, player, deadline, choose_companion=False):
+    '''
+    This function searches a tree of the root in every worker process and adds up the visits of the root moves.
+    Workers that have not answered shortly after the deadline, like workers still starting up, are left out.
+
+    Parameters:
+        state (GameState): the position
+        player (int): 1 if player 1 is to move, -1 if player 2 is to move
+        deadline (float): time.time() the search stops at
+        choose_companion (bool): flag to choose a companion card
+
+    Returns:
+        results (list): (move, visits, wins) of every root move the workers that answered tried
+        stats (dict): playouts of all workers, deepest tree node and deepest playout move
+    '''
+
+    # Workers are kept between moves, so they are not started again
+    while len(search_workers) < MCTS_WORKERS:
+        search_workers.append(ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')))
+
+    # Every worker gets its own seed from the random module, so a seeded game is repeatable
+    futures = [worker.submit(search, state, player, deadline, random.getrandbits(64), choose_companion)
+               for worker in search_workers]
+    done, _ = wait(futures, timeout=max(0.0, deadline - time.time()) + 0.1)
+
+    totals = {}
+    stats = {'nodes': 0, 'depth': 0, 'max_ply': 0}
+
+    # In the order of the workers, so the moves are added up the same way on every run
+    for future in [future for future in futures if future in done]:
+        results, worker_stats = future.result()
+
+        for move, visits, wins in results:
+            _, total_visits, total_wins = totals.get(get_move_key(move), (move, 0, 0.0))
+            totals[get_move_key(move)] = (move, total_visits + visits, total_wins + wins)
+
+        stats['nodes'] += worker_stats['nodes']
+        stats['depth'] = max(stats['depth'], worker_stats['depth'])
+        stats['max_ply'] = max(stats['max_ply'], worker_stats['max_ply'])
+
+    return list(totals.values()), stats
+
+def get_move(cards, player1, player2, companion_cards=None, choose_companion=True):
+    '''
+    This function gets the move of the player with Monte Carlo Tree Search.
+    Like agent.get_move, the search plays player 2.
+
+    Parameters:
+        cards (list): list of Card objects
+        player1 (Player): player 1
+        player2 (Player): player 2
+        companion_cards (dict): dictionary of companion cards
+        choose_companion (bool): flag to choose a companion card
+
+    Returns:
+        move (int/list/None): the move of the player, [] if no companion card can be used
+    '''
+
+    global search_stats
+
+    start = time.time()
+    deadline = start + MOVE_TIME
+    state = GameState.from_cards(cards, player1, player2, companion_cards)
+    moves = get_root_moves(state, choose_companion)
+
+    if not moves:
+        search_stats = None
+        return [] if choose_companion else None
+
+    # Nothing to search with one move
+    if len(moves) == 1:
+        results, stats = [(moves[0], 0, 0.0)], {'nodes': 0, 'depth': 0, 'max_ply': 0}
+
+    elif MCTS_WORKERS > 1:
+        results, stats = parallel_search(state, -1, deadline, choose_companion)
+
+    else:
+        results, stats = search(state, -1, deadline, random.getrandbits(64), choose_companion, True)
+
+    elapsed = time.time() - start
+    stats['time'] = elapsed
+    stats['nodes_per_second'] = stats['nodes'] / elapsed if elapsed > 0 else 0.0
+    search_stats = stats
+
+    # No iteration ended before the deadline
+    if not results:
+        return moves[0]
+
+    # The most visited move is the most reliable one
+    return max(results, key=lambda result: result[1])[0]
+
+def get_stats():
+    '''
+    This function gets the statistics of the search of the last move, read by the game after get_move.
+
+    Returns:
+        stats (dict/None): playouts, time, playouts per second, deepest tree node and deepest playout move
+    '''
+
+    return search_stats
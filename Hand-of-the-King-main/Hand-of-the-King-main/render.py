@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from os.path import basename, join, splitext
+
+# Draw off-screen, the frames are only written to the video
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from main import (path, board_from_snapshot, board_to_snapshot, calculate_winner, house_card_count, load_record,
+                  make_companion_move, make_move, remove_unusable_companion_cards, set_banners)
+from classes import Player
+
+parser = argparse.ArgumentParser(description="A Game of Thrones: Hand of the King game record renderer")
+parser.add_argument('records', metavar='record', type=str, nargs='+', help="game record files from main.py -r, or tournament JSONL files")
+parser.add_argument('-o', '--output', type=str, help="folder the videos are saved to", default=join(path, "videos"))
+parser.add_argument('-w', '--workers', type=int, help="number of processes that render at the same time", default=os.cpu_count())
+parser.add_argument('-c', '--chunk', type=int, help="number of board frames every process renders at once", default=20)
+
+def replay_record(record):
+    '''
+    This function plays the moves of a game record again and lists every frame the drawn game shows.
+
+    Parameters:
+        record (dict): record of the game
+
+    Returns:
+        scenes (list): ('board', cards snapshot, companion cards, footer, gray flag) of every board
+                       and ('winner', winner, winner agent) at the end
+    '''
+
+    cards, companion_cards = board_from_snapshot(record['board'])
+    player1, player2 = Player(record['player1']), Player(record['player2'])
+    selected_house = None
+
+    def scene(footer, is_cards_gray=False):
+        return ('board', board_to_snapshot(cards), dict(companion_cards), footer, is_cards_gray)
+
+    scenes = [scene('0', None), scene('1')]
+
+    for turn, move in record['moves']:
+        player = player1 if turn == 1 else player2
+
+        # Same rules as the game loop of main.play_drawn_game
+        if isinstance(move, list):
+            del companion_cards[move[0]]
+            is_house = make_companion_move(cards, companion_cards, move, player)
+            remove_unusable_companion_cards(cards, companion_cards)
+            set_banners(player1, player2, is_house if is_house is not None else selected_house, turn)
+
+            # Melisandre gives the player another turn
+            if move[0] != 'Melisandre':
+                turn = 2 if turn == 1 else 1
+
+            scenes.append(scene(str(turn)))
+
+        else:
+            selected_house = make_move(cards, move, player)
+            remove_unusable_companion_cards(cards, companion_cards)
+            set_banners(player1, player2, selected_house, turn)
+
+            choose_companion = house_card_count(cards, selected_house) == 0 and len(companion_cards) != 0
+
+            if not choose_companion:
+                turn = 2 if turn == 1 else 1
+
+            scenes.append(scene('CC' if choose_companion else str(turn), choose_companion))
+
+    winner = calculate_winner(player1, player2)
+    scenes.append(('winner', winner, player1.get_agent() if winner == 1 else player2.get_agent()))
+
+    return scenes
+
+def render_chunk(scenes, file_name):
+    '''
+    This function renders frames off-screen to a video file. It runs in a worker process.
+
+    Parameters:
+        scenes (list): scenes from replay_record
+        file_name (str): path of the video file without the extension
+
+    Returns:
+        file_name (str): path of the video file with the extension
+    '''
+
+    # Import the graphics only in the workers, they need pygame and moviepy
+    import pygraphics
+
+    board = pygraphics.init_board()
+    pygraphics.start_video(file_name)
+
+    for scene in scenes:
+        if scene[0] == 'board':
+            _, snapshot, companion_cards, footer, is_cards_gray = scene
+            cards, _ = board_from_snapshot(snapshot)
+            pygraphics.draw_board(board, cards, companion_cards, footer, is_cards_gray)
+
+        else:
+            _, winner, winner_agent = scene
+            pygraphics.display_winner(board, winner, winner_agent)
+
+    pygraphics.save_video()
+    pygraphics.close_board()
+
+    return file_name + '.mp4'
+
+def concatenate_videos(files, output):
+    '''
+    This function joins video files with the same encoding without encoding them again.
+
+    Parameters:
+        files (list): paths of the video files in order
+        output (str): path of the joined video file
+    '''
+
+    from moviepy.config import get_setting
+
+    list_file = output + '.txt'
+
+    with open(list_file, 'w') as file:
+        for video in files:
+            file.write(f"file '{video}'\n")
+
+    try:
+        subprocess.run([get_setting('FFMPEG_BINARY'), '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', list_file, '-c', 'copy', output], check=True)
+
+    finally:
+        os.remove(list_file)
+
+def load_records(files):
+    '''
+    This function loads the game records of record files and tournament JSONL files.
+
+    Parameters:
+        files (list): paths of the files
+
+    Returns:
+        records (list): (name, record) of every game, the name is used for its video
+    '''
+
+    records = []
+
+    for file_name in files:
+        name = splitext(basename(file_name))[0]
+
+        if file_name.endswith('.jsonl'):
+            with open(file_name, 'r') as file:
+                for line in file:
+                    result = json.loads(line)
+                    records.append((f"{name}_game_{result['game']}", result['record']))
+
+        else:
+            records.append((name, load_record(file_name)))
+
+    return records
+
+def render_records(records, output, workers=None, chunk=20):
+    '''
+    This function renders game records to videos. The frames of every game are split into chunks
+    that are encoded in parallel, then the chunks of every game are joined.
+
+    Parameters:
+        records (list): (name, record) of every game
+        output (str): folder the videos are saved to
+        workers (int/None): number of processes, None for every core
+        chunk (int): number of scenes of every chunk
+
+    Returns:
+        videos (list): paths of the videos
+    '''
+
+    os.makedirs(output, exist_ok=True)
+    videos = []
+
+    with tempfile.TemporaryDirectory() as folder, ProcessPoolExecutor(max_workers=workers) as executor:
+        games = []
+
+        # Submit the chunks of every game before waiting for any of them
+        for name, record in records:
+            scenes = replay_record(record)
+            futures = [executor.submit(render_chunk, scenes[i:i + chunk], join(folder, f'{name}_{i // chunk}'))
+                       for i in range(0, len(scenes), chunk)]
+            games.append((name, futures))
+
+        for name, futures in games:
+            video = join(output, name + '.mp4')
+            concatenate_videos([future.result() for future in futures], video)
+            videos.append(video)
+
+    return videos
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    for video in render_records(load_records(args.records), args.output, args.workers, args.chunk):
+        print(video)
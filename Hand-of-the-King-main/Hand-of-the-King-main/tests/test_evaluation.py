@@ -0,0 +1,78 @@
+import random
+import sys
+from os.path import abspath, dirname
+
+# The game modules are imported by name from the folder of main.py
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from main import apply_companion_move, apply_move, make_board
+from classes import Player
+from state import GameState
+from agent import evaluate, getScore, get_root_moves, play_search_move
+
+# getScore adds the heuristic card by card in the order of the list of cards, evaluate adds it
+# house by house from the line statistics. The same terms added in another order differ in the
+# last bits of the float, about 1e-12 at most for the scores of this game
+EVALUATION_TOLERANCE = 1e-9
+
+
+def play_random_games(games, seed):
+    '''
+    This function plays random games on the list of cards and on a GameState side by side.
+
+    Parameters:
+        games (int): number of games
+        seed (int): seed of the boards and the moves
+
+    Yields:
+        position (tuple): cards, player 1, player 2 and the GameState of every position,
+                          they are changed in place by the next move
+    '''
+
+    random.seed(seed)
+
+    for _ in range(games):
+        cards, companion_cards = make_board()
+        player1, player2 = Player('player1'), Player('player2')
+        state = GameState.from_cards(cards, player1, player2, companion_cards)
+        history = []
+        turn, choose_companion = 1, False
+
+        while True:
+            yield cards, player1, player2, state
+
+            moves = get_root_moves(state, choose_companion)
+            if not moves:
+                break
+
+            move = random.choice(moves)
+            player = 1 if turn == 1 else -1
+
+            # The statistics must be the same after the move is undone
+            line_stats = [list(stats) for stats in state.line_stats]
+            play_search_move(state, move, player, choose_companion)
+            state.undo_move()
+            assert state.line_stats == line_stats
+
+            next_player, next_choose_companion = play_search_move(state, move, player, choose_companion)
+
+            if choose_companion:
+                apply_companion_move(cards, companion_cards, move, player1, player2, turn, history)
+            else:
+                apply_move(cards, move, player1, player2, turn, history)
+
+            turn = 1 if next_player == 1 else 2
+            choose_companion = next_choose_companion
+
+
+def test_evaluate_matches_getScore():
+    checked = 0
+
+    for cards, player1, player2, state in play_random_games(100, 0):
+        for player in (1, -1):
+            expected = getScore(cards, player1, player2, player)
+            assert abs(evaluate(state, player) - expected) <= EVALUATION_TOLERANCE, (evaluate(state, player), expected)
+
+        checked += 1
+
+    assert checked > 1000
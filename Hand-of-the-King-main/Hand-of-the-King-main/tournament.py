@@ -0,0 +1,226 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+
+from main import TIMEOUT, board_to_snapshot, load_board, make_board, play_game
+from worker import AgentWorker
+from stats import summarize
+
+parser = argparse.ArgumentParser(description="A Game of Thrones: Hand of the King tournament")
+parser.add_argument('agents', metavar='agent', type=str, nargs='+', help="AI files that play against each other")
+parser.add_argument('-n', '--games', type=int, help="number of boards every pair of agents plays, once with each colour", default=10)
+parser.add_argument('-s', '--seed', type=int, help="seed of the boards and of the agents' random moves", default=0)
+parser.add_argument('-l', '--load', type=str, help="file containing the board every game starts from", default=None)
+parser.add_argument('-o', '--output', type=str, help="JSONL file the result of every game is written to", default='tournament.jsonl')
+parser.add_argument('-w', '--workers', type=int, help="number of games played at the same time", default=os.cpu_count())
+
+def make_boards(games, seed, load=None):
+    '''
+    This function creates the boards of the tournament.
+    Every board has its own seed, so the boards are the same for any number of workers.
+
+    Parameters:
+        games (int): number of boards
+        seed (int): seed of the tournament
+        load (str/None): name of a board file every game starts from, None for random boards
+
+    Returns:
+        boards (list): list of board snapshots
+    '''
+
+    if load is not None:
+        cards, _ = load_board(load)
+
+        return [board_to_snapshot(cards)] * games
+
+    boards = []
+
+    for i in range(games):
+        random.seed(f'{seed}-board-{i}')
+        cards, _ = make_board()
+        boards.append(board_to_snapshot(cards))
+
+    return boards
+
+def make_games(agents, boards, seed):
+    '''
+    This function lists the games of the tournament.
+    Every pair of agents plays every board twice, with the colours swapped.
+
+    Parameters:
+        agents (list): names of the AI files
+        boards (list): list of board snapshots
+        seed (int): seed of the tournament
+
+    Returns:
+        games (list): list of game dictionaries
+    '''
+
+    games = []
+
+    for first, second in itertools.combinations(agents, 2):
+        for i, board in enumerate(boards):
+            for player1, player2 in ((first, second), (second, first)):
+                games.append({
+                    'game': len(games),
+                    'board': i,
+                    'seed': f'{seed}-game-{len(games)}',
+                    'player1': player1,
+                    'player2': player2,
+                    'snapshot': board,
+                })
+
+    return games
+
+agent_workers = {} # Agent workers of a tournament process, kept between its games
+
+def close_agent_workers():
+    '''
+    This function stops the agent workers of the tournament process.
+    '''
+
+    for worker in agent_workers.values():
+        worker.close()
+
+    agent_workers.clear()
+
+def get_agent_worker(agent_name, player):
+    '''
+    This function gets the worker of an agent for one colour, the first game of the tournament process starts it.
+
+    Parameters:
+        agent_name (str): name of the AI file
+        player (int): 1 for player 1, 2 for player 2
+
+    Returns:
+        worker (AgentWorker): worker of the agent
+    '''
+
+    if not agent_workers:
+        # Stop the workers before the tournament process waits for its children to exit
+        Finalize(None, close_agent_workers, exitpriority=10)
+
+    if (agent_name, player) not in agent_workers:
+        agent_workers[(agent_name, player)] = AgentWorker(agent_name, TIMEOUT)
+
+    return agent_workers[(agent_name, player)]
+
+def play_tournament_game(game):
+    '''
+    This function plays one game of the tournament in a worker process.
+
+    Parameters:
+        game (dict): game dictionary from make_games
+
+    Returns:
+        result (dict): result of the game
+    '''
+
+    agent1 = get_agent_worker(game['player1'], 1)
+    agent2 = get_agent_worker(game['player2'], 2)
+
+    # Agents that move randomly get the same moves on every run
+    agent1.set_seed(game['seed'] + '-1')
+    agent2.set_seed(game['seed'] + '-2')
+
+    start = time.perf_counter()
+    result = play_game(agent1, agent2, game['snapshot'])
+    duration = time.perf_counter() - start
+
+    winner = result['winner']
+
+    return {
+        'game': game['game'],
+        'board': game['board'],
+        'player1': game['player1'],
+        'player2': game['player2'],
+        'winner': winner,
+        'winner_agent': {1: game['player1'], 2: game['player2']}.get(winner), # None for a draw
+        'banners': [sum(banners.values()) for banners in result['banners']],
+        'move_times': result['move_times'],
+        'search_stats': result['search_stats'],
+        'timeouts': result['timeouts'],
+        'errors': result['errors'],
+        'duration': duration,
+        'record': result['record'], # Rendered to video by render.py
+    }
+
+def run_tournament(agents, games=10, seed=0, output='tournament.jsonl', workers=None, load=None):
+    '''
+    This function plays a tournament over a process pool and writes the results in the order of the games.
+    A result is written as soon as its game and every game before it ended.
+
+    Parameters:
+        agents (list): names of the AI files
+        games (int): number of boards every pair of agents plays
+        seed (int): seed of the boards and of the agents' random moves
+        output (str): JSONL file the results are written to
+        workers (int/None): number of processes, None for every core
+        load (str/None): name of a board file every game starts from, None for random boards
+
+    Returns:
+        wins (dict): number of games every agent won
+        draws (int): number of games nobody won
+        latency (dict): summary of the move times and nodes per second of every agent
+    '''
+
+    tournament_games = make_games(agents, make_boards(games, seed, load), seed)
+    wins = {agent: 0 for agent in agents}
+    draws = 0
+    move_times = {agent: [] for agent in agents}
+    nodes_per_second = {agent: [] for agent in agents}
+    finished = {} # Results that wait for an earlier game, by the index of their game
+    next_game = 0 # Index of the next game to write
+
+    with open(output, 'w') as file, ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_tournament_game, game) for game in tournament_games]
+
+        for future in as_completed(futures):
+            result = future.result()
+            if result['winner_agent'] is None:
+                draws += 1
+
+            else:
+                wins[result['winner_agent']] += 1
+
+            for agent, times, stats in zip((result['player1'], result['player2']), result['move_times'], result['search_stats']):
+                move_times[agent].extend(times)
+                nodes_per_second[agent].extend(move['nodes_per_second'] for move in stats if move is not None)
+
+            # Games end in any order, the file does not depend on the scheduling
+            finished[result['game']] = result
+
+            while next_game in finished:
+                file.write(json.dumps(finished.pop(next_game)) + '\n')
+                next_game += 1
+
+            file.flush()
+
+    latency = {agent: {'move_times': summarize(move_times[agent]), 'nodes_per_second': summarize(nodes_per_second[agent])}
+               for agent in agents}
+
+    return wins, draws, latency
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    wins, draws, latency = run_tournament(args.agents, args.games, args.seed, args.output, args.workers, args.load)
+
+    for agent, count in wins.items():
+        times = latency[agent]['move_times']
+        print(f"{agent}: {count} wins", end='')
+
+        if times['count']:
+            print(f", move times p50 {times['p50']:.3f}s, p95 {times['p95']:.3f}s, p99 {times['p99']:.3f}s", end='')
+
+        if latency[agent]['nodes_per_second']['count']:
+            print(f", {latency[agent]['nodes_per_second']['p50']:.0f} nodes/s p50", end='')
+
+        print()
+
+    print(f"{draws} draws")
@@ -0,0 +1,132 @@
+MAX_PLY = 64 # Maximum distance from the root of the search
+KILLER_SLOTS = 2 # Number of killer moves kept for every ply
+
+TT_MOVE_SCORE = 1 << 30 # Order score of the best move from the transposition table
+CAPTURE_SCORE = 1 << 25 # Order score of a move that takes cards between Varys and the selected card
+KILLER_SCORE = 1 << 24 # Order score of a killer move
+HISTORY_LIMIT = 1 << 23 # History scores are halved when one of them reaches this value
+
+class MoveOrdering:
+    '''
+    This class orders the moves of a search so that alpha-beta cuts off as early as possible.
+    The best move from the transposition table is tried first, then the moves that take the
+    most cards, then the killer moves of the ply, then the rest by their history score.
+    '''
+
+    def __init__(self):
+        '''
+        This function initializes the killer moves, the history table and the counters.
+        '''
+
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)] # Moves that caused a cutoff at every ply
+        self.history = [[0] * 36, [0] * 36] # Cutoff score of every location for player 1 and player 2
+        self.cutoffs = 0 # Number of beta cutoffs
+        self.first_move_cutoffs = 0 # Number of beta cutoffs caused by the first move tried
+
+    def new_search(self):
+        '''
+        This function prepares the ordering for the search of a new move.
+        Killer moves belong to the old positions, history scores are kept but aged.
+        '''
+
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        self.history = [[score // 2 for score in scores] for scores in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order_moves(self, state, moves, ply, turn, tt_move=None):
+        '''
+        This function sorts the moves of a position, the most promising first.
+
+        Parameters:
+            state (GameState): the position
+            moves (list): list of possible moves
+            ply (int): distance from the root of the search
+            turn (int): 1 if player 1 is to move, 2 if player 2 is to move
+            tt_move (int/None): best move stored in the transposition table
+
+        Returns:
+            moves (list): list of the moves in search order
+        '''
+
+        killers = self.killers[ply]
+        history = self.history[turn - 1]
+        scores = {}
+
+        for move in moves:
+            if move == tt_move:
+                scores[move] = TT_MOVE_SCORE
+
+            else:
+                _, taken = state.get_captures(move)
+                extra = taken.bit_count() - 1 # Cards taken besides the selected card
+
+                if extra:
+                    scores[move] = CAPTURE_SCORE + extra
+
+                elif move in killers:
+                    scores[move] = KILLER_SCORE - killers.index(move)
+
+                else:
+                    scores[move] = history[move]
+
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def order_companion_moves(self, moves, tt_move=None):
+        '''
+        This function puts the best companion move from the transposition table first.
+        The other moves keep the order of the generator and are not created before they are needed.
+
+        Parameters:
+            moves (generator): companion moves of the position
+            tt_move (list/None): best move stored in the transposition table
+
+        Returns:
+            moves (generator): companion moves in search order
+        '''
+
+        if isinstance(tt_move, list):
+            yield tt_move
+
+        for move in moves:
+            if move != tt_move:
+                yield move
+
+    def record_cutoff(self, state, move, ply, depth, turn, first):
+        '''
+        This function records a move that caused a beta cutoff.
+
+        Parameters:
+            state (GameState): the position, with the move undone
+            move (int/list): the move
+            ply (int): distance from the root of the search
+            depth (int): remaining depth of the search
+            turn (int): 1 if player 1 made the move, 2 if player 2 made the move
+            first (bool): whether the move was the first one tried
+        '''
+
+        self.cutoffs += 1
+
+        if first:
+            self.first_move_cutoffs += 1
+
+        # Companion moves have no killer or history score
+        if isinstance(move, list):
+            return
+
+        # Moves that take extra cards are already tried early
+        _, taken = state.get_captures(move)
+        if taken.bit_count() > 1:
+            return
+
+        killers = self.killers[ply]
+
+        if move != killers[0]:
+            killers[1:] = killers[:-1]
+            killers[0] = move
+
+        history = self.history[turn - 1]
+        history[move] += depth * depth
+
+        if history[move] >= HISTORY_LIMIT:
+            self.history[turn - 1] = [score // 2 for score in history]
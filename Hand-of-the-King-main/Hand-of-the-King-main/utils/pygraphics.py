@@ -1,14 +1,15 @@
 import pygame
 import json
 import time
-from moviepy.editor import ImageSequenceClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
 from numpy import rot90, flipud
-from os import pardir, environ
-from os.path import abspath, join, dirname
+from os import pardir, environ, getpid, makedirs, replace
+from os.path import abspath, join, dirname, getmtime
 
 # Get the path of the assets and videos folder
 assets_path = join((abspath(join(dirname(abspath(__file__)), pardir))), "assets")
 videos_path = join((abspath(join(dirname(abspath(__file__)), pardir))), "videos")
+atlas_path = join(assets_path, "atlas") # Folder of the atlases of the pre-scaled images
 
 ROWS = 6 # Number of rows in the board
 COLS = 6 # Number of columns in the board
@@ -19,47 +20,169 @@ BOARD_HEIGHT = ROWS * CARD_SIZE + (ROWS - 1) * MARGIN + FOOTER_SIZE  # Height of
 BOARD_WIDTH = (COLS + 3) * CARD_SIZE + (COLS + 3 - 1) * MARGIN # Width of the board
 WIN_WIDTH = COLS * CARD_SIZE + (COLS - 1) * MARGIN  # Width of the win screen
 WINNER_HEIGHT_OFFSET = 36  # Height offset of the winner text
+ATLAS_VERSION = 1 # Version of the atlas index, raised when the images in the atlas change
+FPS_LIMIT = 30 # Maximum number of times a second the GUI handles events
+EVENT_TIMEOUT = 1000 # Maximum milliseconds the GUI sleeps while waiting for an event
 assets = {} # Dictionary to store every asset
-frames = [] # List to store the frames of the video
+video_writer = None # Encoder of the video, None if no video is being recorded
+held_frame = None # Last distinct frame, written when a different frame comes or the video ends
+held_count = 0 # Number of video frames the held frame is shown for
+drawn = None # Card names by location, companion positions, footer and gray flag of the drawn board, None to draw it all again
 
-def load_assets():
+class GameClosed(Exception):
     '''
-    This function loads the assets of the game.
+    This class represents the window of the game being closed by the player.
+    '''
+
+def get_atlas_name():
+    '''
+    This function gets the name of the atlas files for the size of the cards.
+
+    Returns:
+        name (str): name of the atlas files without the extension
+    '''
+
+    return f'atlas_{CARD_SIZE}'
+
+def load_atlas():
+    '''
+    This function loads the pre-scaled images from the atlas of the size of the cards.
+    The atlas is stale if an image or characters.json changed after it was made.
+
+    Returns:
+        images (dict/None): image of every asset name, None if there is no atlas or it is stale
+    '''
+
+    try:
+        with open(join(atlas_path, get_atlas_name() + '.json')) as f:
+            index = json.load(f)
+
+        if index['version'] != ATLAS_VERSION or index['card_size'] != CARD_SIZE:
+            return None
+
+        # Check that no asset file changed
+        for file, mtime in index['mtimes'].items():
+            if getmtime(join(assets_path, file)) != mtime:
+                return None
+
+        # Read every image at once
+        atlas = pygame.image.load(join(atlas_path, get_atlas_name() + '.png'))
+
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None
+
+    return {name: atlas.subsurface(rect) for name, rect in index['rects'].items()}
+
+def save_atlas(images, mtimes):
+    '''
+    This function packs the images into one atlas image in rows and saves it with its index.
+    The files are written under temporary names and then renamed, so a reader never sees half of them.
+
+    Parameters:
+        images (dict): image of every asset name
+        mtimes (dict): modification time of every asset file the images were made from
+    '''
+
+    # Wide enough for the widest image and a few cards in every row
+    width = max(max(image.get_width() for image in images.values()), 10 * CARD_SIZE)
+
+    rects = {} # Rectangle of every image in the atlas
+    x, y, row_height = 0, 0, 0
+
+    # Put the tallest images first, so the rows waste little space
+    for name in sorted(images, key=lambda name: -images[name].get_height()):
+        image_width, image_height = images[name].get_size()
+
+        # Start a new row
+        if x + image_width > width:
+            x, y, row_height = 0, y + row_height, 0
+
+        rects[name] = [x, y, image_width, image_height]
+        x += image_width
+        row_height = max(row_height, image_height)
+
+    atlas = pygame.Surface((width, y + row_height))
+
+    for name, rect in rects.items():
+        atlas.blit(images[name], rect[:2])
+
+    index = {'version': ATLAS_VERSION, 'card_size': CARD_SIZE, 'mtimes': mtimes, 'rects': rects}
+    image_file = join(atlas_path, get_atlas_name() + '.png')
+    index_file = join(atlas_path, get_atlas_name() + '.json')
+
+    try:
+        makedirs(atlas_path, exist_ok = True)
+
+        # Several renderers may make the same atlas at the same time
+        pygame.image.save(atlas, f'{image_file[:-4]}.{getpid()}.png')
+        replace(f'{image_file[:-4]}.{getpid()}.png', image_file)
+
+        with open(f'{index_file}.{getpid()}', 'w') as f:
+            json.dump(index, f)
+
+        replace(f'{index_file}.{getpid()}', index_file)
+
+    except (OSError, pygame.error): # The assets folder may be read-only, the images are scaled again next time
+        pass
+
+def build_atlas():
+    '''
+    This function loads and scales the images of the game and saves them to the atlas of the size of the cards.
+
+    Returns:
+        images (dict): image of every asset name
     '''
 
+    # Get the time before reading, a file changed while the atlas is made makes it stale
+    characters_mtime = getmtime(join(assets_path, 'characters.json'))
+
     # Get the characters of the game
     with open(join(assets_path, 'characters.json')) as f:
         characters = json.load(f)
-    
+
     companions = characters['Companion'] # Companions of the game
 
     # Remove the companions from the characters
     del characters['Companion']
 
-    # Load the images of the companions
+    files = {} # Asset file and size of every image
+
     for companion in companions:
-        # Load the image of the companion
-        assets[companion] = pygame.image.load(join(assets_path, 'companions', companion + ".jpg"))
+        files[companion] = (join('companions', companion + ".jpg"), (CARD_SIZE * 1.5, CARD_SIZE * 2.3))
 
-        # Resize the image of the companion
-        assets[companion] = pygame.transform.scale(assets[companion], (CARD_SIZE * 1.5, CARD_SIZE * 2.3))
+    for house in characters.values():
+        for character in house:
+            files[character] = (join('cards', character + ".jpg"), (CARD_SIZE, CARD_SIZE))
 
-    house_characters = list(characters.values())
+    files['icon'] = (join('icons', 'icon.jpg'), (256, 256))
+    files['win_screen'] = (join('backgrounds', 'win_screen.jpg'), (WIN_WIDTH, BOARD_HEIGHT))
 
-    # Load all the images of the cards
-    for house in house_characters:
-        for character in house:
-            # Load the image of the card
-            assets[character] = pygame.image.load(join(assets_path, 'cards', character + ".jpg"))
+    mtimes = {file: getmtime(join(assets_path, file)) for file, _ in files.values()}
+    mtimes['characters.json'] = characters_mtime
 
-            # Resize the image of the card
-            assets[character] = pygame.transform.scale(assets[character], (CARD_SIZE, CARD_SIZE))
-    
-    # Load the icon of the window
-    assets['icon'] = pygame.image.load(join(assets_path, 'icons', 'icon.jpg'))
+    images = {}
+
+    # Load and resize every image
+    for name, (file, size) in files.items():
+        images[name] = pygame.transform.scale(pygame.image.load(join(assets_path, file)), size)
+
+    save_atlas(images, mtimes)
 
-    # Resize the icon of the window
-    assets['icon'] = pygame.transform.scale(assets['icon'], (256, 256))
+    return images
+
+def load_assets():
+    '''
+    This function loads the assets of the game.
+    The images are read from the atlas at once, it is made again if it is missing or stale.
+    '''
+
+    # Load the images of the companions, the cards, the icon and the win screen
+    images = load_atlas()
+
+    if images is None:
+        images = build_atlas()
+
+    assets.update(images)
 
     # Set the font of the text (Arial, 20pt)
     font = pygame.font.SysFont('Arial', 20)
@@ -72,12 +195,6 @@ def load_assets():
     assets['BC1'] = font.render('Choose the first card', True, [0, 0, 0])
     assets['BC2'] = font.render('Choose the second card', True, [0, 0, 0])
 
-    # Load the background of win screen
-    assets['win_screen'] = pygame.image.load(join(assets_path, 'backgrounds', 'win_screen.jpg'))
-
-    # Resize the background of win screen to the size of the board
-    assets['win_screen'] = pygame.transform.scale(assets['win_screen'], (WIN_WIDTH, BOARD_HEIGHT))
-    
     separation_x = COLS * CARD_SIZE + (COLS - 1) * MARGIN + (MARGIN // 2)
     gray_color = (128, 128, 128, 128)  # (R, G, B, Alpha)
 
@@ -103,9 +220,14 @@ def init_board():
         screen (pygame.Surface): the screen for the game
     '''
 
+    global drawn
+
     # Initialize Pygame
     pygame.init()
 
+    # The new window has nothing drawn on it
+    drawn = None
+
     # Get the size of the monitor
     monitor_info = pygame.display.Info()
 
@@ -153,23 +275,65 @@ def init_board():
 
     return board
 
-def update():
+def update(rects = None):
     '''
     This function updates the display.
+
+    Parameters:
+        rects (list/None): rectangles of the board that changed, None for the whole board
+    '''
+
+    if rects is None:
+        pygame.display.update()
+
+    else:
+        pygame.display.update(rects)
+
+def start_video(file_name, FPS = 30):
+    '''
+    This function starts the video of the game, the frames are encoded while the game is played.
+    It must be called after init_board, which sets the size of the board.
+
+    Parameters:
+        file_name (str): name of the video file in the videos folder, or its path, without the extension
+        FPS (int): frames per second
+    '''
+
+    global video_writer, held_frame, held_count
+
+    video_writer = FFMPEG_VideoWriter(join(videos_path, file_name + '.mp4'), (BOARD_WIDTH, BOARD_HEIGHT), FPS, codec = 'libx264')
+    held_frame = None
+    held_count = 0
+
+def write_held_frame():
+    '''
+    This function writes the held frame to the video for as long as it is shown.
     '''
 
-    pygame.display.update()
+    for _ in range(held_count):
+        video_writer.write_frame(held_frame)
 
-def store_frame(board, needs_resize = False, FPS = 30):
+def store_frame(board, needs_resize = False, FPS = 30, changed = True):
     '''
-    This function stores the frame of the board.
+    This function stores the frame of the board, it is shown for one second of the video.
+    Only the last distinct frame is kept in memory, a frame that is the same as it makes it last longer.
 
     Parameters:
         board (pygame.Surface): the screen for the game
         needs_resize (bool): whether the frame needs to be resized
         FPS (int): frames per second
+        changed (bool): whether the board changed since the last stored frame
     '''
 
+    global held_frame, held_count
+
+    if video_writer is None: # No video is being recorded
+        return
+
+    if not changed and held_frame is not None:
+        held_count += FPS # Show the held frame longer, without reading the board
+        return
+
     frame = pygame.surfarray.array3d(board) # Get the frame
 
     if needs_resize: # For the win screen
@@ -179,22 +343,29 @@ def store_frame(board, needs_resize = False, FPS = 30):
     frame = rot90(frame) # Rotate the frame
     frame = flipud(frame) # Flip the frame
 
-    for _ in range(FPS):
-        frames.append(frame) # Store the frame
+    if held_frame is not None:
+        write_held_frame()
 
-def save_video(file_name):
-    '''
-    This function saves the video of the game.
+    held_frame = frame
+    held_count = FPS
 
-    Parameters:
-        file_name (str): name of the video file
+def save_video():
     '''
+    This function writes the last frame and closes the video of the game.
+    '''
+
+    global video_writer, held_frame
+
+    if video_writer is None:
+        return
 
-    # Create a video of the game
-    clip = ImageSequenceClip(frames, fps = 30)
+    if held_frame is not None:
+        write_held_frame()
 
-    # Save the video
-    clip.write_videofile(join(videos_path, file_name + '.mp4'), codec = 'libx264')
+    video_writer.close()
+
+    video_writer = None
+    held_frame = None
 
 def draw_footer(board, text):
     '''
@@ -241,9 +412,96 @@ def draw_companions(board, companions):
         # Draw the companion on the board
         board.blit(companion_img, (x, y))
 
+def draw_cell(board, location, name, is_gray):
+    '''
+    This function draws one cell of the cards on the board again.
+
+    Parameters:
+        board (pygame.Surface): the screen for the game
+        location (int): location of the cell
+        name (str/None): name of the card in the cell, None if the cell is empty
+        is_gray (bool): whether the cards are grayed out
+
+    Returns:
+        rect (pygame.Rect): rectangle of the cell
+    '''
+
+    # Calculate the row and column of the cell
+    row, col = location // COLS, location % COLS
+
+    # Calculate the rectangle of the cell
+    rect = pygame.Rect(col * CARD_SIZE + col * MARGIN, row * CARD_SIZE + row * MARGIN, CARD_SIZE, CARD_SIZE)
+
+    # Clear the cell
+    board.fill([255, 255, 255], rect)
+
+    if name is not None:
+        # Draw the card in the cell
+        board.blit(assets[name], rect)
+
+    if is_gray:
+        # Draw the part of the gray surface that covers the cell
+        board.blit(assets['cards_gray_surface'], rect, rect)
+
+    return rect
+
+def draw_companions_area(board, companions, is_gray):
+    '''
+    This function draws the companions part of the board again, right of the separating line.
+
+    Parameters:
+        board (pygame.Surface): the screen for the game
+        companions (dict): dictionary of companions
+        is_gray (bool): whether the companions are grayed out
+
+    Returns:
+        rect (pygame.Rect): rectangle of the companions part
+    '''
+
+    line_x = COLS * CARD_SIZE + (COLS - 1) * MARGIN + (MARGIN // 2)
+
+    # Everything right of the separating line, which is 2 pixels wide
+    rect = pygame.Rect(line_x + 2, 0, BOARD_WIDTH - line_x - 2, BOARD_HEIGHT)
+
+    # Clear the companions part
+    board.fill([255, 255, 255], rect)
+
+    # Draw the companions
+    draw_companions(board, companions)
+
+    if is_gray:
+        # Draw the part of the gray surface that covers the companions part
+        board.blit(assets['companions_gray_surface'], rect, rect.move(-line_x, 0))
+
+    return rect
+
+def draw_footer_area(board, banner_footer):
+    '''
+    This function draws the footer again.
+
+    Parameters:
+        board (pygame.Surface): the screen for the game
+        banner_footer (str): text to display in the footer
+
+    Returns:
+        rect (pygame.Rect): rectangle of the footer
+    '''
+
+    rect = pygame.Rect(0, BOARD_HEIGHT - FOOTER_SIZE, COLS * CARD_SIZE + (COLS - 1) * MARGIN, FOOTER_SIZE)
+
+    # Clear the footer
+    board.fill([255, 255, 255], rect)
+
+    # Draw the footer
+    draw_footer(board, banner_footer)
+
+    return rect
+
 def draw_board(board, cards, companions, banner_footer, is_cards_gray = False):
     '''
     This function draws the cards on the board.
+    Only the cells, companions and footer that changed since the last drawn board are drawn and updated,
+    the whole board is drawn when the gray parts change.
 
     Parameters:
         board (pygame.Surface): the screen for the game
@@ -253,6 +511,38 @@ def draw_board(board, cards, companions, banner_footer, is_cards_gray = False):
         is_cards_gray (bool): whether the cards should be grayed out
     '''
 
+    global drawn
+
+    # What is on the board now, to compare with what was drawn last
+    cells = {card.get_location(): card.get_name() for card in cards}
+    companion_cells = {companion: (companions[companion]['Row'], companions[companion]['Column']) for companion in companions}
+
+    if drawn is not None and drawn[3] == is_cards_gray:
+        drawn_cells, drawn_companions, drawn_footer, _ = drawn
+        rects = [] # Rectangles of the board that changed
+
+        # Captured cards, the move of Varys and the cards swapped by Ramsay
+        for location in cells.keys() | drawn_cells.keys():
+            if cells.get(location) != drawn_cells.get(location):
+                rects.append(draw_cell(board, location, cells.get(location), is_cards_gray is not False))
+
+        if companion_cells != drawn_companions:
+            rects.append(draw_companions_area(board, companions, not is_cards_gray))
+
+        if banner_footer != drawn_footer:
+            rects.append(draw_footer_area(board, banner_footer))
+
+        drawn = (cells, companion_cells, banner_footer, is_cards_gray)
+
+        # Update only the changed rectangles of the display
+        update(rects)
+
+        store_frame(board, changed = len(rects) > 0) # Store the frame
+
+        return
+
+    drawn = (cells, companion_cells, banner_footer, is_cards_gray)
+
     # Clear the board
     board.fill([255, 255, 255])
 
@@ -325,8 +615,13 @@ def display_winner(board, winner, winner_agent):
         winner_agent (str): the agent of the winner
     '''
 
+    global drawn
+
     board = pygame.display.set_mode([WIN_WIDTH, BOARD_HEIGHT])
 
+    # The board is not on the window anymore
+    drawn = None
+
     # Clear the board
     board.fill([255, 255, 255])
 
@@ -363,6 +658,33 @@ def display_winner(board, winner, winner_agent):
 
     store_frame(board, True) # Store the frame
 
+def wait_events(timeout):
+    '''
+    This function sleeps until an event comes or the timeout passes, then gets every waiting event.
+    The close button raises GameClosed, so the game can save what it has so far.
+
+    Parameters:
+        timeout (int): maximum milliseconds to sleep
+
+    Returns:
+        events (list): events that came, empty if the timeout passed
+    '''
+
+    # Sleep without using the CPU until the first event
+    event = pygame.event.wait(timeout)
+
+    if event.type == pygame.NOEVENT: # The timeout passed
+        return []
+
+    events = [event] + pygame.event.get()
+
+    for event in events:
+        # Check if the event is the close button
+        if event.type == pygame.QUIT:
+            raise GameClosed()
+
+    return events
+
 def show_board(seconds):
     '''
     This function shows the board for a certain amount of time.
@@ -371,19 +693,17 @@ def show_board(seconds):
         seconds (int): number of seconds to show the board
     '''
 
-    # Get the initial time
-    initial_time = time.time()
+    # Get the time the board is shown until
+    end_time = time.time() + seconds
 
     # Show the board for the given amount of time
-    while time.time() - initial_time < seconds:
-        for event in pygame.event.get():
-            # Check if the event is the close button
-            if event.type == pygame.QUIT:
-                # Close the window
-                pygame.quit()
+    while time.time() < end_time:
+        # Limit how often the events are handled, but do not sleep past the end time
+        frame_end = min(time.time() + 1 / FPS_LIMIT, end_time)
+
+        wait_events(max(1, min(EVENT_TIMEOUT, int((end_time - time.time()) * 1000))))
 
-                # Exit the program
-                exit()
+        pygame.time.wait(max(0, int((frame_end - time.time()) * 1000)))
 
 def get_player_move(card_moves, companions = None):
     '''
@@ -419,9 +739,12 @@ def get_player_move(card_moves, companions = None):
     # Check if the player has made a move
     move_made = False
 
+    # Limit how often the events are handled
+    clock = pygame.time.Clock()
+
     while not move_made:
-        # Get the event
-        for event in pygame.event.get():
+        # Sleep until the player does something
+        for event in wait_events(EVENT_TIMEOUT):
             # Check if the event is a mouse click
             if event.type == pygame.MOUSEBUTTONDOWN:
                 # Get the position of the mouse
@@ -451,14 +774,9 @@ def get_player_move(card_moves, companions = None):
                 # Check if the location is valid
                 if location < ROWS * COLS and location in card_moves:
                     move_made = True
-            
-            # Check if the event is the close button
-            elif event.type == pygame.QUIT:
-                # Close the window
-                pygame.quit()
-
-                # Exit the program
-                exit()
+
+        if not move_made:
+            clock.tick(FPS_LIMIT)
 
     return location
 
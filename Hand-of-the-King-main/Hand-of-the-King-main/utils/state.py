@@ -0,0 +1,650 @@
+import random
+from classes import Card
+
+ROWS = 6 # Number of rows in the board
+COLS = 6 # Number of columns in the board
+
+HOUSES = ['Stark', 'Greyjoy', 'Lannister', 'Targaryen', 'Baratheon', 'Tyrell', 'Tully'] # Houses in tie-break order
+HOUSE_INDEX = {house: i for i, house in enumerate(HOUSES)} # Index of every house
+HOUSE_MEMBER_COUNT = [8, 7, 6, 5, 4, 3, 2] # Number of cards of every house
+COMPANIONS = ['Jon', 'Gendry', 'Ramsay', 'Sandor', 'Jaqen', 'Melisandre'] # Companion cards
+
+# Bitmask of every row and column of the board
+ROW_MASKS = [((1 << COLS) - 1) << (row * COLS) for row in range(ROWS)]
+COL_MASKS = [sum(1 << (row * COLS + col) for row in range(ROWS)) for col in range(COLS)]
+
+# Bitmask of the locations in the same row or column as a location, without the location itself
+LINE_MASKS = [(ROW_MASKS[location // COLS] | COL_MASKS[location % COLS]) & ~(1 << location) for location in range(ROWS * COLS)]
+
+LOCATION_ROWS = [location // COLS for location in range(ROWS * COLS)] # Row of every location
+LOCATION_COLS = [location % COLS for location in range(ROWS * COLS)] # Column of every location
+
+# Indexes of the line statistics kept for the cards of every house on the board
+STAT_COUNT = 0 # Number of cards
+STAT_ROW_SUM = 1 # Sum of the rows of the cards
+STAT_ROW_SQUARES = 2 # Sum of the squared rows of the cards
+STAT_COL_SUM = 3 # Sum of the columns of the cards
+STAT_COL_SQUARES = 4 # Sum of the squared columns of the cards
+STAT_PAIRS = 5 # Ordered pairs of cards in the same row or column
+STAT_ROWS = 6 # Number of cards in every row, at STAT_ROWS + row
+STAT_COLS = STAT_ROWS + ROWS # Number of cards in every column, at STAT_COLS + col
+STAT_SIZE = STAT_COLS + COLS # Length of the statistics of a house
+
+def update_line_stats(stats, location, delta):
+    '''
+    This function adds a card to or removes a card from the line statistics of its house.
+
+    Parameters:
+        stats (list): line statistics of the house, changed in place
+        location (int): location of the card
+        delta (int): 1 to add the card, -1 to remove it
+    '''
+
+    row = LOCATION_ROWS[location]
+    col = LOCATION_COLS[location]
+
+    if delta < 0:
+        stats[STAT_ROWS + row] -= 1
+        stats[STAT_COLS + col] -= 1
+
+    # The card makes two ordered pairs with every other card in its row and column
+    stats[STAT_PAIRS] += delta * 2 * (stats[STAT_ROWS + row] + stats[STAT_COLS + col])
+
+    if delta > 0:
+        stats[STAT_ROWS + row] += 1
+        stats[STAT_COLS + col] += 1
+
+    stats[STAT_COUNT] += delta
+    stats[STAT_ROW_SUM] += delta * row
+    stats[STAT_ROW_SQUARES] += delta * row * row
+    stats[STAT_COL_SUM] += delta * col
+    stats[STAT_COL_SQUARES] += delta * col * col
+
+def _between_mask(start, end):
+    '''
+    This function gets the locations strictly between two locations of the same row or column.
+
+    Parameters:
+        start (int): first location
+        end (int): second location
+
+    Returns:
+        mask (int): bitmask of the locations in between
+    '''
+
+    if start // COLS == end // COLS:
+        step = 1
+
+    elif start % COLS == end % COLS:
+        step = COLS
+
+    else:
+        return 0
+
+    mask = 0
+
+    for location in range(min(start, end) + step, max(start, end), step):
+        mask |= 1 << location
+
+    return mask
+
+# Bitmask of the locations between Varys and a selected card, indexed by [varys_location][move]
+BETWEEN_MASKS = [[_between_mask(start, end) for end in range(ROWS * COLS)] for start in range(ROWS * COLS)]
+
+# Random 64-bit keys for Zobrist hashing, the seed is fixed so hashes are the same in every process
+ZOBRIST_SEED = 20250101
+_zobrist_random = random.Random(ZOBRIST_SEED)
+
+ZOBRIST_CARDS = [[_zobrist_random.getrandbits(64) for location in range(ROWS * COLS)] for house in HOUSES] # Card of a house at a location
+ZOBRIST_VARYS = [_zobrist_random.getrandbits(64) for location in range(ROWS * COLS)] # Varys at a location
+
+# Number of cards of a house taken by a player, Jon and Gendry together can add three cards more than the house has
+ZOBRIST_CAPTURED = [[[_zobrist_random.getrandbits(64) for count in range(HOUSE_MEMBER_COUNT[house] + 4)]
+                     for house in range(len(HOUSES))] for player in range(2)]
+
+ZOBRIST_BANNERS = [[_zobrist_random.getrandbits(64) for house in HOUSES] for player in range(2)] # Banner of a house held by a player
+ZOBRIST_COMPANIONS = {companion: _zobrist_random.getrandbits(64) for companion in COMPANIONS} # Remaining companion card
+ZOBRIST_TURN = _zobrist_random.getrandbits(64) # Player 1 to move, for callers that hash the turn
+ZOBRIST_CHOOSE_COMPANION = _zobrist_random.getrandbits(64) # The player to move must choose a companion card
+
+def get_locations(mask):
+    '''
+    This function gets the locations of the set bits of a bitmask.
+
+    Parameters:
+        mask (int): bitmask of locations
+
+    Returns:
+        locations (list): list of locations in increasing order
+    '''
+
+    locations = []
+
+    while mask:
+        bit = mask & -mask
+        locations.append(bit.bit_length() - 1)
+        mask ^= bit
+
+    return locations
+
+class GameState:
+    '''
+    This class represents the game in a compact form for searching and simulating.
+    The board is stored as one occupancy bitmask per house, where bit i is set if
+    location i holds a card of that house. Players are stored as the number of
+    cards they took from every house and the banners they hold.
+    '''
+
+    def __init__(self):
+        '''
+        This function initializes an empty game state.
+        '''
+
+        self.boards = [0] * len(HOUSES) # Occupancy bitmask of every house
+        self.line_stats = [[0] * STAT_SIZE for house in HOUSES] # Line statistics of every house, replaced instead of changed
+        self.varys = 0 # Location of Varys
+        self.names = [None] * (ROWS * COLS) # Name of the card at every location, kept for converting back to cards
+        self.captured = [[0] * len(HOUSES), [0] * len(HOUSES)] # Number of cards of every house taken by player 1 and player 2
+        self.banners = [[0] * len(HOUSES), [0] * len(HOUSES)] # Banners of player 1 and player 2
+        self.companions = {} # Dictionary of the remaining companion cards
+        self.history = [] # Undo stack of the moves made on the state
+        self.hash = 0 # Zobrist hash of the position, kept up to date by the moves
+
+    @classmethod
+    def from_cards(cls, cards, player1=None, player2=None, companion_cards=None):
+        '''
+        This function creates a game state from the objects used by the game.
+
+        Parameters:
+            cards (list): list of Card objects
+            player1 (Player): player 1
+            player2 (Player): player 2
+            companion_cards (dict): dictionary of companion cards
+
+        Returns:
+            state (GameState): the game state
+        '''
+
+        state = cls()
+
+        for card in cards:
+            location = card.get_location()
+            state.names[location] = card.get_name()
+
+            if card.get_name() == 'Varys':
+                state.varys = location
+
+            else:
+                state.boards[HOUSE_INDEX[card.get_house()]] |= 1 << location
+                update_line_stats(state.line_stats[HOUSE_INDEX[card.get_house()]], location, 1)
+
+        for i, player in enumerate((player1, player2)):
+            if player is None:
+                continue
+
+            for house, house_cards in player.get_cards().items():
+                state.captured[i][HOUSE_INDEX[house]] = len(house_cards)
+
+            for house, banner in player.get_banners().items():
+                state.banners[i][HOUSE_INDEX[house]] = banner
+
+        if companion_cards is not None:
+            state.companions = dict(companion_cards)
+
+        state.hash = state.compute_hash()
+
+        return state
+
+    def compute_hash(self):
+        '''
+        This function computes the Zobrist hash of the position from scratch.
+
+        Returns:
+            hash (int): Zobrist hash of the position
+        '''
+
+        hash = ZOBRIST_VARYS[self.varys]
+
+        for house in range(len(HOUSES)):
+            for location in get_locations(self.boards[house]):
+                hash ^= ZOBRIST_CARDS[house][location]
+
+            for player in range(2):
+                hash ^= ZOBRIST_CAPTURED[player][house][self.captured[player][house]]
+
+                if self.banners[player][house]:
+                    hash ^= ZOBRIST_BANNERS[player][house]
+
+        for companion in self.companions:
+            hash ^= ZOBRIST_COMPANIONS[companion]
+
+        return hash
+
+    def to_cards(self):
+        '''
+        This function creates the list of cards on the board.
+
+        Returns:
+            cards (list): list of Card objects, in location order
+        '''
+
+        cards = []
+
+        for location in get_locations(self.get_occupied() | (1 << self.varys)):
+            if location == self.varys:
+                cards.append(Card('No House', 'Varys', location))
+
+            else:
+                cards.append(Card(HOUSES[self.get_house(location)], self.names[location], location))
+
+        return cards
+
+    def get_occupied(self):
+        '''
+        This function gets the locations of every card except Varys.
+
+        Returns:
+            mask (int): bitmask of the occupied locations
+        '''
+
+        boards = self.boards
+
+        return boards[0] | boards[1] | boards[2] | boards[3] | boards[4] | boards[5] | boards[6]
+
+    def get_house(self, location):
+        '''
+        This function gets the house of the card at a location.
+
+        Parameters:
+            location (int): location of the card
+
+        Returns:
+            house (int/None): index of the house, None if there is no card of a house
+        '''
+
+        bit = 1 << location
+
+        for house in range(len(HOUSES)):
+            if self.boards[house] & bit:
+                return house
+
+        return None
+
+    def get_card_count(self):
+        '''
+        This function counts the cards on the board, Varys included.
+
+        Returns:
+            count (int): number of cards
+        '''
+
+        return self.get_occupied().bit_count() + 1
+
+    def house_card_count(self, house):
+        '''
+        This function counts the cards of a house on the board.
+
+        Parameters:
+            house (int): index of the house
+
+        Returns:
+            count (int): number of cards of the house
+        '''
+
+        return self.boards[house].bit_count()
+
+    def get_possible_moves(self):
+        '''
+        This function gets the possible moves for the player.
+
+        Returns:
+            moves (list): list of possible moves
+        '''
+
+        return get_locations(LINE_MASKS[self.varys] & self.get_occupied())
+
+    def get_captures(self, move):
+        '''
+        This function gets the cards a move would take.
+
+        Parameters:
+            move (int): location of the card
+
+        Returns:
+            house (int): index of the house of the selected card
+            mask (int): bitmask of the taken cards, the selected card included
+        '''
+
+        house = self.get_house(move)
+
+        return house, (BETWEEN_MASKS[self.varys][move] & self.boards[house]) | (1 << move)
+
+    def set_house_banner(self, house, turn):
+        '''
+        This function sets the banner of the house of the last chosen card.
+
+        Parameters:
+            house (int): index of the house
+            turn (int): 1 if player 1 made the move, 2 if player 2 made the move
+        '''
+
+        player1_count = self.captured[0][house]
+        player2_count = self.captured[1][house]
+
+        # The player with the more cards of the house gets the banner, the last player if the number of cards is the same
+        player1_banner = 1 if player1_count > player2_count or (player1_count == player2_count and turn == 1) else 0
+
+        if self.banners[0][house] != player1_banner:
+            self.hash ^= ZOBRIST_BANNERS[0][house]
+
+        if self.banners[1][house] != 1 - player1_banner:
+            self.hash ^= ZOBRIST_BANNERS[1][house]
+
+        self.banners[0][house] = player1_banner
+        self.banners[1][house] = 1 - player1_banner
+
+    def add_captured(self, player, house, count):
+        '''
+        This function adds cards of a house to the cards taken by a player.
+
+        Parameters:
+            player (int): 0 for player 1, 1 for player 2
+            house (int): index of the house
+            count (int): number of cards
+        '''
+
+        old_count = self.captured[player][house]
+
+        self.hash ^= ZOBRIST_CAPTURED[player][house][old_count] ^ ZOBRIST_CAPTURED[player][house][old_count + count]
+        self.captured[player][house] = old_count + count
+
+    def remove_card(self, location):
+        '''
+        This function removes a card from the board.
+
+        Parameters:
+            location (int): location of the card
+        '''
+
+        house = self.get_house(location)
+
+        self.boards[house] &= ~(1 << location)
+        self.hash ^= ZOBRIST_CARDS[house][location]
+        self.update_house_stats(house, location, -1)
+
+    def update_house_stats(self, house, location, delta):
+        '''
+        This function adds a card to or removes a card from the line statistics of a house.
+        The statistics are copied before the change, so undo can put the old ones back.
+
+        Parameters:
+            house (int): index of the house
+            location (int): location of the card
+            delta (int): 1 to add the card, -1 to remove it
+        '''
+
+        stats = self.line_stats[house][:]
+        update_line_stats(stats, location, delta)
+        self.line_stats[house] = stats
+
+    def set_companions(self, companions):
+        '''
+        This function replaces the dictionary of the remaining companion cards.
+
+        Parameters:
+            companions (dict): dictionary of companion cards
+        '''
+
+        for companion in self.companions:
+            if companion not in companions:
+                self.hash ^= ZOBRIST_COMPANIONS[companion]
+
+        for companion in companions:
+            if companion not in self.companions:
+                self.hash ^= ZOBRIST_COMPANIONS[companion]
+
+        self.companions = companions
+
+    def remove_unusable_companion_cards(self):
+        '''
+        This function removes the companion cards that cannot be used, like main.remove_unusable_companion_cards.
+        The dictionary is replaced instead of changed, so undo can put the old one back.
+        '''
+
+        if not self.companions:
+            return
+
+        card_count = self.get_card_count()
+        companions = self.companions
+
+        if 'Ramsay' in companions and card_count < 2: # Ramsay needs at least two cards to swap
+            companions = {key: value for key, value in companions.items() if key != 'Ramsay'}
+
+        if 'Melisandre' in companions and not LINE_MASKS[self.varys] & self.get_occupied(): # No moves left
+            companions = {key: value for key, value in companions.items() if key != 'Melisandre'}
+
+        if any(value['Choice'] > card_count - 1 for value in companions.values()): # More choices than cards
+            companions = {key: value for key, value in companions.items() if value['Choice'] <= card_count - 1}
+
+        if 'Jaqen' in companions and len(companions) == 1: # Jaqen is the only companion card left
+            companions = {}
+
+        if companions is not self.companions:
+            self.set_companions(companions)
+
+    def make_move(self, move, turn):
+        '''
+        This function makes a move and sets the banner of the selected house.
+
+        Parameters:
+            move (int): location of the card
+            turn (int): 1 if player 1 makes the move, 2 if player 2 makes the move
+
+        Returns:
+            house (int): index of the house of the selected card
+        '''
+
+        house, taken = self.get_captures(move)
+        player = turn - 1
+        hash = self.hash
+
+        stats = self.line_stats[house]
+
+        self.history.append((house, self.boards[house], self.varys, player, self.captured[player][house],
+                             self.banners[0][house], self.banners[1][house], self.companions, hash, stats))
+
+        # Take the cards and move Varys
+        keys = ZOBRIST_CARDS[house]
+        stats = stats[:]
+        bits = taken
+
+        while bits:
+            bit = bits & -bits
+            location = bit.bit_length() - 1
+            hash ^= keys[location]
+            update_line_stats(stats, location, -1)
+            bits ^= bit
+
+        self.line_stats[house] = stats
+
+        self.hash = hash ^ ZOBRIST_VARYS[self.varys] ^ ZOBRIST_VARYS[move]
+        self.boards[house] ^= taken
+        self.add_captured(player, house, taken.bit_count())
+        self.varys = move
+
+        self.set_house_banner(house, turn)
+        self.remove_unusable_companion_cards()
+
+        return house
+
+    def generate_companion_moves(self):
+        '''
+        This function generates every legal companion move, like main.validate_agent_move accepts them.
+        Ramsay and Jaqen choose unordered pairs, since the order of their two cards does not change the result.
+
+        Returns:
+            moves (generator): companion moves, every one is the companion card followed by its choices
+        '''
+
+        cards = get_locations(self.get_occupied()) # Locations of the cards except Varys
+        ramsay_cards = sorted(cards + [self.varys]) # Ramsay can swap Varys too
+
+        for companion, info in self.companions.items():
+            choices = info['Choice']
+
+            if companion == 'Jaqen':
+                others = [other for other in self.companions if other != 'Jaqen']
+
+                for i in range(len(cards)):
+                    for j in range(i + 1, len(cards)):
+                        for other in others:
+                            yield [companion, cards[i], cards[j], other]
+
+            elif choices == 2: # Ramsay
+                for i in range(len(ramsay_cards)):
+                    for j in range(i + 1, len(ramsay_cards)):
+                        yield [companion, ramsay_cards[i], ramsay_cards[j]]
+
+            elif choices == 1: # Jon and Sandor
+                for location in cards:
+                    yield [companion, location]
+
+            else: # Gendry and Melisandre
+                yield [companion]
+
+    def make_companion_move(self, move, turn):
+        '''
+        This function uses a companion card, like the game loop does with main.make_companion_move.
+
+        Parameters:
+            move (list): companion card followed by its choices
+            turn (int): 1 if player 1 makes the move, 2 if player 2 makes the move
+
+        Returns:
+            house (int/None): index of the house of the selected card
+        '''
+
+        selected_companion = move[0]
+        player = turn - 1
+        house = None
+
+        # Companion moves are rare, so the whole state is recorded
+        self.history.append((None, list(self.boards), self.varys, [list(self.captured[0]), list(self.captured[1])],
+                             [list(self.banners[0]), list(self.banners[1])], self.companions, self.hash, move,
+                             list(self.line_stats)))
+
+        companions = {key: value for key, value in self.companions.items() if key != selected_companion}
+
+        if selected_companion == 'Jon':
+            house = self.get_house(move[1])
+            self.add_captured(player, house, 2)
+
+        elif selected_companion == 'Gendry':
+            house = HOUSE_INDEX['Baratheon']
+            self.add_captured(player, house, 1)
+
+        elif selected_companion == 'Ramsay':
+            self.swap_cards(move[1], move[2])
+
+        elif selected_companion == 'Sandor':
+            self.remove_card(move[1])
+
+        elif selected_companion == 'Jaqen':
+            for location in move[1:3]:
+                self.remove_card(location)
+
+            del companions[move[3]]
+
+        self.set_companions(companions)
+
+        if house is not None:
+            self.set_house_banner(house, turn)
+
+        self.remove_unusable_companion_cards()
+
+        return house
+
+    def swap_cards(self, first, second):
+        '''
+        This function swaps the cards at two locations, Varys included.
+
+        Parameters:
+            first (int): location of the first card
+            second (int): location of the second card
+        '''
+
+        first_house = self.get_house(first)
+        second_house = self.get_house(second)
+
+        for house, location in ((first_house, first), (second_house, second)):
+            if house is not None:
+                self.boards[house] ^= 1 << location
+                self.hash ^= ZOBRIST_CARDS[house][location]
+                self.update_house_stats(house, location, -1)
+
+            else:
+                self.hash ^= ZOBRIST_VARYS[location]
+
+        for house, location in ((first_house, second), (second_house, first)):
+            if house is not None:
+                self.boards[house] ^= 1 << location
+                self.hash ^= ZOBRIST_CARDS[house][location]
+                self.update_house_stats(house, location, 1)
+
+            else:
+                self.varys = location
+                self.hash ^= ZOBRIST_VARYS[location]
+
+        self.names[first], self.names[second] = self.names[second], self.names[first]
+
+    def undo_move(self):
+        '''
+        This function undoes the last move made with make_move or make_companion_move.
+        '''
+
+        record = self.history.pop()
+
+        if record[0] is not None:
+            house, board, varys, player, captured, player1_banner, player2_banner, companions, hash, stats = record
+
+            self.boards[house] = board
+            self.line_stats[house] = stats
+            self.captured[player][house] = captured
+            self.banners[0][house] = player1_banner
+            self.banners[1][house] = player2_banner
+
+        else:
+            _, boards, varys, captured, banners, companions, hash, move, line_stats = record
+
+            self.boards = boards
+            self.line_stats = line_stats
+            self.captured = captured
+            self.banners = banners
+
+            if move[0] == 'Ramsay':
+                self.names[move[1]], self.names[move[2]] = self.names[move[2]], self.names[move[1]]
+
+        self.varys = varys
+        self.companions = companions
+        self.hash = hash
+
+    def calculate_winner(self):
+        '''
+        This function determines the winner of the game, like main.calculate_winner.
+
+        Returns:
+            winner (int/None): 1 if player 1 wins, 2 if player 2 wins, None if nobody wins
+        '''
+
+        player1_score = sum(self.banners[0])
+        player2_score = sum(self.banners[1])
+
+        if player1_score != player2_score:
+            return 1 if player1_score > player2_score else 2
+
+        # If the scores are the same, whoever has the banner of the house with the most cards wins
+        for house in range(len(HOUSES)):
+            if self.banners[0][house] != self.banners[1][house]:
+                return 1 if self.banners[0][house] > self.banners[1][house] else 2
+
+        return None
@@ -0,0 +1,149 @@
+import math
+import time
+
+COUNTERS = ['nodes', 'tt_probes', 'tt_hits', 'tt_stores', 'cutoffs', 'first_move_cutoffs'] # Counters that are added up over search processes
+
+class SearchStats:
+    '''
+    This class records what the search did for one move: time, nodes, transposition
+    table use, beta cutoffs and depth. The table and cutoff counters are read from the
+    transposition table and the move ordering, as the difference since the search started.
+    '''
+
+    def __init__(self, transposition_table, ordering):
+        '''
+        This function starts recording a search.
+
+        Parameters:
+            transposition_table (TranspositionTable): table of the search
+            ordering (MoveOrdering): move ordering of the search
+        '''
+
+        self.transposition_table = transposition_table
+        self.ordering = ordering
+        self.start_time = time.perf_counter()
+        self.end_time = None # Set by finish
+        self.nodes = 0 # Number of positions searched
+        self.depth = 0 # Depth of the deepest completed iteration
+        self.max_ply = 0 # Deepest ply reached by the search
+        self.result = None # Proven result for player 1 if the game was solved to the end: 1 win, 0 draw, -1 loss
+        self.start_counts = self.get_table_counts()
+        self.added = dict.fromkeys(COUNTERS, 0) # Counters of other search processes
+
+    def get_table_counts(self):
+        '''
+        This function reads the counters of the transposition table and the move ordering.
+
+        Returns:
+            counts (list): probes, hits and stores of the table, and cutoffs and first move cutoffs of the ordering
+        '''
+
+        table = self.transposition_table
+
+        return [table.probes, table.hits, table.stores, self.ordering.cutoffs, self.ordering.first_move_cutoffs]
+
+    def get_counts(self):
+        '''
+        This function gets the counters of the search, the added ones included.
+
+        Returns:
+            counts (dict): value of every counter and the deepest ply
+        '''
+
+        probes, hits, stores, cutoffs, first_move_cutoffs = [now - start for now, start in zip(self.get_table_counts(), self.start_counts)]
+
+        counts = {
+            'nodes': self.nodes,
+            'tt_probes': probes,
+            'tt_hits': hits,
+            'tt_stores': stores,
+            'cutoffs': cutoffs,
+            'first_move_cutoffs': first_move_cutoffs,
+        }
+
+        for name in COUNTERS:
+            counts[name] += self.added[name]
+
+        counts['max_ply'] = self.max_ply
+
+        return counts
+
+    def add(self, counts):
+        '''
+        This function adds the counters of a search in another process.
+
+        Parameters:
+            counts (dict): counters from get_counts of the other search
+        '''
+
+        for name in COUNTERS:
+            self.added[name] += counts[name]
+
+        self.max_ply = max(self.max_ply, counts['max_ply'])
+
+    def finish(self):
+        '''
+        This function stops the clock of the search.
+        '''
+
+        self.end_time = time.perf_counter()
+
+    def to_dict(self):
+        '''
+        This function gets the statistics of the search.
+
+        Returns:
+            stats (dict): counters, wall time, nodes per second, hit rate, first move cutoff rate, depth and proven result of the search
+        '''
+
+        stats = self.get_counts()
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+
+        stats['time'] = end_time - self.start_time
+        stats['nodes_per_second'] = stats['nodes'] / stats['time'] if stats['time'] > 0 else 0.0
+        stats['tt_hit_rate'] = stats['tt_hits'] / stats['tt_probes'] if stats['tt_probes'] else 0.0
+        stats['first_move_cutoff_rate'] = stats['first_move_cutoffs'] / stats['cutoffs'] if stats['cutoffs'] else 0.0
+        stats['depth'] = self.depth
+        stats['result'] = self.result
+
+        return stats
+
+def percentile(values, percent):
+    '''
+    This function gets a percentile of a list of values, by the nearest rank.
+
+    Parameters:
+        values (list): list of numbers, not empty
+        percent (float): percentile between 0 and 100
+
+    Returns:
+        value (float): smallest value that is at least as large as percent % of the values
+    '''
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+
+    return ordered[rank - 1]
+
+def summarize(values):
+    '''
+    This function summarizes a list of values, like the times of the moves of an agent.
+
+    Parameters:
+        values (list): list of numbers
+
+    Returns:
+        summary (dict): count, mean, p50, p95, p99 and max of the values, only the count if there are none
+    '''
+
+    if not values:
+        return {'count': 0}
+
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
@@ -0,0 +1,88 @@
+EXACT = 0 # The score is the exact value of the position
+LOWER = 1 # The score is a lower bound, the search failed high
+UPPER = 2 # The score is an upper bound, the search failed low
+
+class TranspositionTable:
+    '''
+    This class represents a fixed-size transposition table for the search.
+    Every entry stores the remaining depth and the bound type of its score, and the
+    generation of the search that stored it, so the table can be kept between moves.
+    '''
+
+    def __init__(self, size=1 << 20):
+        '''
+        This function initializes the table.
+
+        Parameters:
+            size (int): maximum number of entries
+        '''
+
+        self.size = size
+        self.entries = [None] * size # (key, depth, flag, score, move, generation) of every slot
+        self.generation = 0 # Generation of the current search
+        self.probes = 0 # Number of lookups
+        self.hits = 0 # Number of lookups that found the position
+        self.stores = 0 # Number of entries written
+
+    def new_search(self):
+        '''
+        This function starts a new generation, the entries of older generations are replaced first.
+        '''
+
+        self.generation += 1
+
+    def clear(self):
+        '''
+        This function removes every entry from the table.
+        '''
+
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key):
+        '''
+        This function looks up a position in the table.
+
+        Parameters:
+            key (int): Zobrist hash of the position
+
+        Returns:
+            entry (tuple/None): (key, depth, flag, score, move, generation) of the position, None if not found
+        '''
+
+        entry = self.entries[key % self.size]
+        self.probes += 1
+
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        '''
+        This function stores the result of a search in the table.
+        An entry of the current generation is only replaced by a search that is at least as deep,
+        entries of older generations are always replaced.
+
+        Parameters:
+            key (int): Zobrist hash of the position
+            depth (int): remaining depth of the search
+            flag (int): EXACT, LOWER or UPPER
+            score (float): score of the position
+            move (int/list/None): best move of the position
+        '''
+
+        index = key % self.size
+        entry = self.entries[index]
+
+        # Whether it holds the same position or another one
+        if entry is not None and entry[5] == self.generation and entry[1] > depth:
+            return
+
+        # Keep the best move of the position if the new search did not find one
+        if move is None and entry is not None and entry[0] == key:
+            move = entry[4]
+
+        self.entries[index] = (key, depth, flag, score, move, self.generation)
+        self.stores += 1
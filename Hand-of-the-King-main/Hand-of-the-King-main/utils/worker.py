@@ -0,0 +1,291 @@
+import importlib
+import os
+import random
+import signal
+import time
+import traceback
+from multiprocessing import get_context
+from classes import Card, Player
+
+CLOSE_TIMEOUT = 2 # Seconds an agent has to stop its own processes when the worker is closed
+
+def encode_game(cards, player1, player2, companion_cards, choose_companion):
+    '''
+    This function converts the game to a compact message for an agent worker.
+
+    Parameters:
+        cards (list): list of Card objects
+        player1 (Player): player 1
+        player2 (Player): player 2
+        companion_cards (dict): dictionary of companion cards
+        choose_companion (bool): flag to choose a companion card
+
+    Returns:
+        message (tuple): cards, players, companion cards and the flag in plain Python types
+    '''
+
+    players = []
+
+    for player in (player1, player2):
+        # Only the name of every taken card is kept, they have no location anymore
+        taken = {house: [card.get_name() for card in house_cards] for house, house_cards in player.get_cards().items()}
+        players.append((player.get_agent(), taken, dict(player.get_banners())))
+
+    board = [(card.get_house(), card.get_name(), card.get_location()) for card in cards]
+
+    return board, players, dict(companion_cards), choose_companion
+
+def decode_game(message):
+    '''
+    This function creates the game objects from a message of encode_game.
+
+    Parameters:
+        message (tuple): message from encode_game
+
+    Returns:
+        arguments (tuple): cards, player 1, player 2, companion cards and the flag, in the order of get_move
+    '''
+
+    board, players, companion_cards, choose_companion = message
+
+    cards = [Card(house, name, location) for house, name, location in board]
+
+    decoded = []
+
+    for agent, taken, banners in players:
+        player = Player(agent)
+
+        for house, names in taken.items():
+            for name in names:
+                player.add_card(Card(house, name, None))
+
+        for house, banner in banners.items():
+            if banner:
+                player.get_house_banner(house)
+
+        decoded.append(player)
+
+    return cards, decoded[0], decoded[1], companion_cards, choose_companion
+
+def stop_agent(agent):
+    '''
+    This function stops the work an agent keeps between moves, its pondering and the processes of its search.
+
+    Parameters:
+        agent (module): AI agent
+    '''
+
+    if hasattr(agent, 'stop_pondering'):
+        agent.stop_pondering()
+
+    for executor in getattr(agent, 'search_workers', []):
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def serve_agent(agent_name, connection):
+    '''
+    This function runs in the worker process, it answers every game message with the move of the agent.
+    The agent module is imported once, so its caches are kept between moves.
+    Messages are ('move', game message), ('seed', seed) or None to stop.
+    Agents with a get_stats function send the statistics of every move before the move.
+    The worker starts its own process group, so the processes the agent starts can be killed with it.
+
+    Parameters:
+        agent_name (str): name of the AI file
+        connection (Connection): end of the pipe to the game
+    '''
+
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+    agent = importlib.import_module(agent_name)
+
+    # Agents that publish their best move while searching send it to the game right away
+    if hasattr(agent, 'publish_move'):
+        agent.publish_move = lambda move: connection.send(('best', move))
+
+    connection.send(('ready', None))
+
+    while True:
+        try:
+            message = connection.recv()
+
+        except EOFError: # The game closed the pipe
+            break
+
+        if message is None:
+            break
+
+        kind, payload = message
+
+        # Seed the random moves of the agent, no answer is sent
+        if kind == 'seed':
+            random.seed(payload)
+            continue
+
+        try:
+            move = agent.get_move(*decode_game(payload))
+
+            if hasattr(agent, 'get_stats'):
+                connection.send(('stats', agent.get_stats()))
+
+            connection.send(('move', move))
+
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+    stop_agent(agent)
+
+class AgentWorker:
+    '''
+    This class represents an AI agent running in its own long-lived process.
+    The game sends every position as a compact message. A move that takes longer
+    than the time limit is given up on, and the process is killed and started again.
+    The last move the agent published before that is played instead.
+    '''
+
+    def __init__(self, agent_name, timeout):
+        '''
+        This function initializes the worker and starts its process.
+
+        Parameters:
+            agent_name (str): name of the AI file
+            timeout (float): seconds the agent has for every move
+        '''
+
+        self.__name__ = agent_name # Name of the AI file, like the name of its module
+        self.timeout = timeout
+        self.process = None # Process of the agent
+        self.connection = None # End of the pipe to the process
+        self.restarts = 0 # Number of times the process was killed and started again
+        self.seed = None # Seed of the random moves of the agent, sent again after a restart
+        self.stats = None # Statistics of the last move, None if the agent sent none
+
+        self.start()
+
+    def start(self):
+        '''
+        This function starts the process and waits until the agent is imported,
+        so the import does not count against the first move.
+        '''
+
+        context = get_context('spawn')
+        self.connection, child_connection = context.Pipe()
+
+        # The agent may start processes of its own, so the worker cannot be a daemon
+        self.process = context.Process(target=serve_agent, args=(self.__name__, child_connection))
+        self.process.start()
+
+        child_connection.close()
+
+        self.connection.recv() # Wait for the ready message
+
+        if self.seed is not None:
+            self.connection.send(('seed', self.seed))
+
+    def get_move(self, cards, player1, player2, companion_cards, choose_companion):
+        '''
+        This function gets the move of the agent within the time limit.
+
+        Parameters:
+            cards (list): list of Card objects
+            player1 (Player): player 1
+            player2 (Player): player 2
+            companion_cards (dict): dictionary of companion cards
+            choose_companion (bool): flag to choose a companion card
+
+        Returns:
+            move (int/list/None): move from the agent, the last published move if it ran out of time, None if there is none
+        '''
+
+        deadline = time.perf_counter() + self.timeout
+        best_move = None # Last move the agent published
+        self.stats = None
+
+        self.connection.send(('move', encode_game(cards, player1, player2, companion_cards, choose_companion)))
+
+        while True:
+            remaining = deadline - time.perf_counter()
+
+            if remaining <= 0 or not self.connection.poll(remaining):
+                # Stop the agent for real, so it does not use the time of the next move
+                self.restarts += 1
+                self.kill()
+                self.start()
+
+                return best_move
+
+            status, value = self.connection.recv()
+
+            if status == 'best':
+                best_move = value
+
+            elif status == 'stats':
+                self.stats = value
+
+            elif status == 'error':
+                raise RuntimeError(f"{self.__name__} failed:\n{value}")
+
+            else:
+                return value
+
+    def get_stats(self):
+        '''
+        This function gets the statistics the agent sent with its last move.
+
+        Returns:
+            stats (dict/None): statistics of the last move, None if the agent sent none
+        '''
+
+        return self.stats
+
+    def set_seed(self, seed):
+        '''
+        This function seeds the random module of the agent process.
+
+        Parameters:
+            seed (int/str): seed of the random moves of the agent
+        '''
+
+        self.seed = seed
+        self.connection.send(('seed', seed))
+
+    def kill(self):
+        '''
+        This function kills the process of the agent together with the processes the agent started.
+        '''
+
+        if self.process is None:
+            return
+
+        # The processes of the agent are in the process group of the worker
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+
+            except ProcessLookupError: # The worker and its processes already ended
+                pass
+
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+        self.process = None
+        self.connection = None
+
+    def close(self):
+        '''
+        This function stops the process of the agent. The agent is asked to stop its own processes first,
+        an agent that is still searching does not answer in time and is killed.
+        '''
+
+        if self.process is None:
+            return
+
+        try:
+            self.connection.send(None)
+
+        except OSError: # The worker already ended
+            pass
+
+        self.process.join(CLOSE_TIMEOUT)
+        self.kill()
@@ -1,7 +1,7 @@
 from math import inf
 import copy
 import random
-from main import make_move, get_possible_moves, print_cards_status, set_banners
+from main import apply_move, undo_move, get_possible_moves, print_cards_status, set_banners
 
 houses = ["Stark", "Greyjoy", "Lannister", "Targaryen", "Baratheon", "Tyrell", "Tully"]
 
@@ -183,17 +183,16 @@ def minimax(player1, player2, cards, depth, alpha, beta, player):
     if depth == 0 or len(cards) == 0:  # Either hit depth limit or game over
         return [move, getScore(cards, player1, player2, player)]
 
-    for moves in get_possible_moves(cards):
-        current_cards = copy.deepcopy(cards)
-        current_player1_status = copy.deepcopy(player1)
-        current_player2_status = copy.deepcopy(player2)
+    history = []
 
-        if player == 1:
-            make_move(cards, moves, player1)
-        else:
-            make_move(cards, moves, player2)
+    for moves in get_possible_moves(cards):
+        apply_move(cards, moves, player1, player2, 1 if player == 1 else 2, history)
 
         score = minimax(player1, player2, cards, depth - 1, alpha, beta, -player)
+
+        # Restore game state
+        undo_move(cards, None, player1, player2, history)
+
         if player == 1:
             if score[1] > alpha:
                 alpha = score[1]
@@ -203,11 +202,6 @@ def minimax(player1, player2, cards, depth, alpha, beta, player):
                 beta = score[1]
                 move = moves
 
-        # Restore game state
-        cards = current_cards
-        player1 = current_player1_status
-        player2 = current_player2_status
-
         if alpha >= beta:
             break
     